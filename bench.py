@@ -0,0 +1,587 @@
+"""Load test and benchmark harness for the Flask service in main.py.
+
+Seeds a synthetic DOAN_NT106-shaped dataset into a scratch database, drives
+the routes with concurrent clients through Flask's test client and reports
+throughput, p50/p95/p99 latency and MongoDB commands per request.
+
+    python bench.py --mongomock --users 1000 --projects 200 --tasks 20000
+    python bench.py --mongo mongodb://localhost:27017 --save-baseline bench_baseline.json
+    python bench.py --mongo mongodb://localhost:27017 --baseline bench_baseline.json
+    python bench.py --scenario login-storm --mongomock
+    python bench.py --scenario serialization --tasks 50000
+    python bench.py --scenario search --mongo mongodb://localhost:27017 --projects 100000
+    python bench.py --scenario user-import --mongomock --import-rows 2000
+    python bench.py --scenario workload --mongo mongodb://localhost:27017 --requests 100
+
+Commands per request are only counted against a real mongod (pymongo command
+monitoring); mongomock runs report them as "-".
+"""
+import argparse
+import itertools
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import MongoClient, monitoring
+from werkzeug.security import generate_password_hash
+
+import main
+
+PASSWORD = "password"
+STATUSES = ['Ongoing', 'Completed', 'Pending', 'Delayed', 'Canceled']
+WORDS = ["alpha", "beta", "gamma", "delta", "network", "socket", "chat", "server", "client",
+         "report", "design", "deploy", "mobile", "web", "api", "database", "cache", "queue"]
+
+
+# ------------------------------ QUERY COUNTING ------------------------------ #
+class CommandCounter(monitoring.CommandListener):
+    # Đếm số lệnh MongoDB của request đang chạy trên thread hiện tại
+    def __init__(self):
+        self._local = threading.local()
+
+    def reset(self):
+        self._local.count = 0
+
+    @property
+    def count(self):
+        return getattr(self._local, 'count', 0)
+
+    def started(self, event):
+        self._local.count = self.count + 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+# --------------------------------- DATASET --------------------------------- #
+def connect(args):
+    if args.mongomock:
+        import mongomock
+        return mongomock.MongoClient(), None
+    counter = CommandCounter()
+    return MongoClient(args.mongo, event_listeners=[counter, main.command_metrics]), counter
+
+
+app = None
+
+
+def use_database(client, name):
+    # Tạo app trỏ sang database benchmark thay vì DOAN_NT106 thật
+    global app
+    # Index được tạo sau khi seed (seed xóa và tạo lại các collection)
+    app = main.create_app({"MONGO_DB": name, "OVERDUE_JOB_INTERVAL": 0,
+                           "DELETION_JOB_INTERVAL": 0, "ENSURE_INDEXES": False}, mongo_client=client)
+    return client[name]
+
+
+def midnight(value):
+    # StartDate/EndDate/DueDate lưu dạng datetime 00:00 như các route ghi
+    return datetime(value.year, value.month, value.day)
+
+
+def zipf_weights(n, skew):
+    return [1.0 / (rank ** skew) for rank in range(1, n + 1)]
+
+
+def seed(database, args):
+    rng = random.Random(args.seed)
+    for name in ("user", "project", "tasks"):
+        database.drop_collection(name)
+
+    now = datetime.utcnow()
+    password_hash = generate_password_hash(PASSWORD, app.config['PASSWORD_HASH_METHOD'])
+    users = [{
+        '_id': ObjectId(),
+        'Username': f"user{i}",
+        'Email': f"user{i}@example.com",
+        'Password': password_hash,
+        'Name': f"User {i}",
+        'role': 'user',
+        'CreateDate': now
+    } for i in range(args.users)]
+    insert_batches(database.user, users)
+    user_ids = [user['_id'] for user in users]
+
+    # Một số ít user tham gia rất nhiều dự án, đa số chỉ vài dự án
+    popularity = zipf_weights(len(user_ids), args.skew)
+    projects = []
+    for i in range(args.projects):
+        creator = rng.choices(user_ids, popularity)[0]
+        size = min(len(user_ids), max(1, int(rng.paretovariate(1.5) * args.members)))
+        member_ids = {creator, *rng.choices(user_ids, popularity, k=size)}
+        start = now - timedelta(days=rng.randint(0, 365))
+        projects.append({
+            '_id': ObjectId(),
+            'ProjectName': f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {i}",
+            'Description': " ".join(rng.choices(WORDS, k=8)),
+            'StartDate': midnight(start),
+            'EndDate': midnight(start + timedelta(days=rng.randint(30, 400))),
+            'Status': rng.choice(STATUSES),
+            'CreatedBy': creator,
+            'CreateDate': start,
+            'Members': [{'MemberID': member_id, 'Role': 'Owner' if member_id == creator else rng.choice(['Admin', 'Member', 'Viewer'])}
+                        for member_id in member_ids],
+            'Revision': 0
+        })
+
+    # Task cũng lệch: vài dự án lớn chiếm phần lớn task
+    project_weights = zipf_weights(len(projects), args.skew)
+    tasks = []
+    for _ in range(args.tasks):
+        project = rng.choices(projects, project_weights)[0]
+        tasks.append({
+            'ProjectID': project['_id'],
+            'AssignedTo': rng.choice(project['Members'])['MemberID'],
+            'TaskName': " ".join(rng.choices(WORDS, k=3)),
+            'Description': " ".join(rng.choices(WORDS, k=12)),
+            'DueDate': midnight(now + timedelta(days=rng.randint(-60, 120))),
+            'Status': rng.choice(['Pending', 'Ongoing', 'Completed']),
+            'Progress': rng.randint(0, 100),
+            'CreateDate': now
+        })
+        tasks[-1]['Overdue'] = main.task_is_overdue(tasks[-1]['Status'], tasks[-1]['DueDate'])
+    insert_batches(database.tasks, tasks)
+
+    counts = {}
+    for task in tasks:
+        project_counts = counts.setdefault(task['ProjectID'], {"Total": 0})
+        project_counts["Total"] += 1
+        project_counts[task['Status']] = project_counts.get(task['Status'], 0) + 1
+    for project in projects:
+        project['TaskCounts'] = counts.get(project['_id'], {"Total": 0})
+    insert_batches(database.project, projects)
+
+    try:
+        with app.app_context():
+            errors = main.ensure_indexes()
+    except NotImplementedError:  # mongomock không hỗ trợ một số loại index
+        errors = ["indexes skipped on mongomock"]
+    for error in errors:
+        print(f"warning: {error}", file=sys.stderr)
+
+    return {"users": users, "projects": projects, "task_ids": [task['_id'] for task in tasks]}
+
+
+def insert_batches(collection, docs, size=5000):
+    for start in range(0, len(docs), size):
+        collection.insert_many(docs[start:start + size], ordered=False)
+
+
+# --------------------------------- ROUTES --------------------------------- #
+def route_requests(data, rng):
+    # Mỗi route là một hàm sinh (method, url, json) từ dữ liệu đã seed
+    projects = data['projects']
+    users = data['users']
+    task_ids = data['task_ids']
+
+    def member_of(project):
+        return rng.choice(project['Members'])['MemberID']
+
+    def owned_project():
+        project = rng.choice(projects)
+        return project, project['CreatedBy']
+
+    def login():
+        return "POST", "/login", {"Identifier": rng.choice(users)['Username'], "Password": PASSWORD}
+
+    def view_project():
+        project = rng.choice(projects)
+        return "GET", f"/project?ProjectID={project['_id']}&UserID={member_of(project)}", None
+
+    def user_projects():
+        return "GET", f"/user_projects?UserID={member_of(rng.choice(projects))}", None
+
+    def user_projects_page():
+        return "GET", f"/user_projects?UserID={member_of(rng.choice(projects))}&limit=20", None
+
+    def tasks():
+        return "GET", f"/tasks?ProjectID={rng.choice(projects)['_id']}", None
+
+    def tasks_page():
+        return "GET", f"/tasks?ProjectID={rng.choice(projects)['_id']}&limit=100", None
+
+    def task_progress_report():
+        return "GET", f"/task_progress_report?UserID={member_of(rng.choice(projects))}", None
+
+    def project_report():
+        return "GET", f"/project_report?ProjectID={rng.choice(projects)['_id']}", None
+
+    def search_projects():
+        project = rng.choice(projects)
+        return "GET", f"/search_projects?UserID={member_of(project)}&status={rng.choice(STATUSES)}", None
+
+    def project_members():
+        project, creator = owned_project()
+        identifiers = [user['Username'] for user in rng.sample(users, min(5, len(users)))]
+        return "POST", "/project_members", {"AdminID": str(creator), "ProjectID": str(project['_id']),
+                                            "Identifiers": identifiers, "Role": "Member"}
+
+    def create_task():
+        project, creator = owned_project()
+        return "POST", "/create_task", {"AdminID": str(creator), "ProjectID": str(project['_id']),
+                                        "AssignedTo": str(member_of(project)), "TaskName": "bench task",
+                                        "Description": "created by bench.py",
+                                        "DueDate": (datetime.utcnow() + timedelta(days=7)).strftime('%Y-%m-%d')}
+
+    def update_task():
+        return "PUT", "/update_task", {"TaskID": str(rng.choice(task_ids)),
+                                       "Status": rng.choice(['Pending', 'Ongoing', 'Completed'])}
+
+    def update_task_progress():
+        return "PUT", "/update_task_progress", {"TaskID": str(rng.choice(task_ids)), "Progress": rng.randint(0, 100)}
+
+    return {
+        "/login": login,
+        "/project": view_project,
+        "/user_projects": user_projects,
+        "/user_projects?limit": user_projects_page,
+        "/tasks": tasks,
+        "/tasks?limit": tasks_page,
+        "/task_progress_report": task_progress_report,
+        "/project_report": project_report,
+        "/search_projects": search_projects,
+        "/project_members": project_members,
+        "/create_task": create_task,
+        "/update_task": update_task,
+        "/update_task_progress": update_task_progress
+    }
+
+
+def send(client, counter, make_request):
+    method, url, body = make_request()
+    if counter:
+        counter.reset()
+    started = time.perf_counter()
+    response = client.open(url, method=method, json=body)
+    elapsed = time.perf_counter() - started
+    return elapsed, response.status_code, counter.count if counter else None
+
+
+def drive(make_request, counter, clients, total):
+    # `clients` thread gửi tổng cộng `total` request, mỗi thread một test client riêng
+    local = threading.local()
+
+    def one(_):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        return send(local.client, counter, make_request)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        samples = list(pool.map(one, range(total)))
+    wall = time.perf_counter() - started
+    return summarize(samples, wall)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(samples, wall):
+    latencies = sorted(sample[0] * 1000 for sample in samples)
+    queries = [sample[2] for sample in samples if sample[2] is not None]
+    return {
+        "requests": len(samples),
+        "throughput": len(samples) / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "queries_per_request": statistics.mean(queries) if queries else None,
+        "errors": sum(1 for sample in samples if sample[1] >= 500),
+        "rejected": sum(1 for sample in samples if sample[1] == 503)
+    }
+
+
+def print_table(results):
+    print(f"{'route':<26}{'req':>7}{'req/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'q/req':>8}{'5xx':>6}")
+    for route, result in results.items():
+        queries = result['queries_per_request']
+        print(f"{route:<26}{result['requests']:>7}{result['throughput']:>10.1f}{result['p50_ms']:>9.2f}"
+              f"{result['p95_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+              f"{'-' if queries is None else f'{queries:.1f}':>8}{result['errors']:>6}")
+
+
+def compare(results, baseline, tolerance):
+    # Chậm hơn/ít throughput hơn quá `tolerance` hoặc nhiều query hơn baseline đều là regression
+    regressions = []
+    for route, result in results.items():
+        base = baseline.get(route)
+        if not base:
+            continue
+        if result['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{route}: p95 {result['p95_ms']:.2f}ms > baseline {base['p95_ms']:.2f}ms")
+        if result['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(f"{route}: {result['throughput']:.1f} req/s < baseline {base['throughput']:.1f} req/s")
+        if (result['queries_per_request'] is not None and base.get('queries_per_request') is not None
+                and result['queries_per_request'] > base['queries_per_request'] + 0.01):
+            regressions.append(f"{route}: {result['queries_per_request']:.1f} queries/request "
+                               f"> baseline {base['queries_per_request']:.1f}")
+        if result['errors']:
+            regressions.append(f"{route}: {result['errors']} server errors")
+    return regressions
+
+
+# -------------------------------- SCENARIOS -------------------------------- #
+def run_routes(args, database, counter):
+    data = seed(database, args)
+    requests = route_requests(data, random.Random(args.seed))
+    selected = args.routes.split(',') if args.routes else list(requests)
+
+    results = {}
+    for route in selected:
+        if route not in requests:
+            raise SystemExit(f"Unknown route {route!r}, choose from: {', '.join(requests)}")
+        drive(requests[route], counter, args.clients, min(args.warmup, args.requests))
+        results[route] = drive(requests[route], counter, args.clients, args.requests)
+    print_table(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+def run_login_storm(args, database, counter):
+    # Throughput của một route không cần hash (/project) khi có và không có bão đăng nhập
+    data = seed(database, args)
+    requests = route_requests(data, random.Random(args.seed))
+
+    calm = drive(requests["/project"], counter, args.clients, args.requests)
+
+    stop = threading.Event()
+    logins = []
+
+    def storm():
+        client = app.test_client()
+        while not stop.is_set():
+            logins.append(send(client, None, requests["/login"])[1])
+
+    stormers = [threading.Thread(target=storm, daemon=True) for _ in range(args.storm_clients)]
+    for thread in stormers:
+        thread.start()
+    stormy = drive(requests["/project"], counter, args.clients, args.requests)
+    stop.set()
+    for thread in stormers:
+        thread.join()
+
+    print_table({"/project (idle)": calm, "/project (login storm)": stormy})
+    print(f"logins during storm: {len(logins)}, ok: {logins.count(200)}, rejected 503: {logins.count(503)}")
+    ratio = stormy['throughput'] / calm['throughput'] if calm['throughput'] else 0
+    print(f"/project throughput under storm: {ratio:.0%} of idle")
+    return 0 if ratio >= 1 - args.tolerance else 1
+
+
+def run_serialization(args):
+    # bytes/s: chuyển từng field bằng tay như trước đây so với JSONProvider hiện tại
+    now = datetime.utcnow()
+    tasks = [{
+        '_id': ObjectId(), 'ProjectID': ObjectId(), 'AssignedTo': ObjectId(),
+        'TaskName': "bench task", 'Description': "x" * 64, 'DueDate': '2024-01-01',
+        'Status': 'Pending', 'Progress': 50, 'CreateDate': now
+    } for _ in range(args.tasks)]
+
+    def per_field():
+        converted = []
+        for task in tasks:
+            task = dict(task)
+            task['_id'] = str(task['_id'])
+            task['AssignedTo'] = str(task['AssignedTo'])
+            task['ProjectID'] = str(task['ProjectID'])
+            task['CreateDate'] = task['CreateDate'].isoformat()
+            converted.append(task)
+        return json.dumps({"tasks": converted}, sort_keys=True, separators=(",", ":"))
+
+    json_provider = main.create_app({"ENSURE_INDEXES": False}).json  # Không kết nối MongoDB
+
+    def provider():
+        return json_provider.dumps({"tasks": tasks}, separators=(",", ":"))
+
+    for name, fn in (("per-field conversion", per_field), ("JSONProvider", provider)):
+        fn()
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            body = fn()
+        elapsed = (time.perf_counter() - started) / args.repeat
+        print(f"{name:<22}{len(tasks)} tasks  {len(body) / 1e6:.1f} MB  {elapsed * 1000:.1f} ms  "
+              f"{len(body) / elapsed / 1e6:.1f} MB/s")
+    return 0
+
+
+def run_search(args, database, counter):
+    # /search_projects (text index + $facet) so với cách cũ: $regex + count_documents + skip/limit
+    data = seed(database, args)
+    rng = random.Random(args.seed)
+    projects = database.project
+
+    def user_and_word():
+        project = rng.choice(data['projects'])
+        return rng.choice(project['Members'])['MemberID'], rng.choice(WORDS)
+
+    def regex_search():
+        user_id, word = user_and_word()
+        filters = {"$or": [
+            {"CreatedBy": user_id}, {"Members.MemberID": user_id},
+            {"ProjectName": {"$regex": word, "$options": "i"}},
+            {"Description": {"$regex": word, "$options": "i"}}
+        ]}
+        page = rng.randint(1, 5)
+        started = time.perf_counter()
+        projects.count_documents(filters)
+        list(projects.find(filters).skip((page - 1) * 10).limit(10).sort("CreateDate", -1))
+        return time.perf_counter() - started, 200, None
+
+    client = app.test_client()
+
+    def text_search():
+        user_id, word = user_and_word()
+        page = rng.randint(1, 5)
+        return send(client, None, lambda: ("GET", f"/search_projects?UserID={user_id}&query={word}&page={page}", None))
+
+    results = {}
+    for name, fn in (("regex + count + skip", regex_search), ("/search_projects", text_search)):
+        started = time.perf_counter()
+        samples = [fn() for _ in range(args.requests)]
+        results[name] = summarize(samples, time.perf_counter() - started)
+    print_table(results)
+    return 0
+
+
+def run_user_import(args, database, counter):
+    # Tạo `--import-rows` user bằng /Create_User (song song --clients) so với một request /import_users
+    database.drop_collection("user")
+    try:
+        with app.app_context():
+            errors = main.ensure_indexes()
+    except NotImplementedError:
+        errors = ["indexes skipped on mongomock"]
+    for error in errors:
+        print(f"warning: {error}", file=sys.stderr)
+
+    numbers = itertools.count()
+
+    def create_user():
+        i = next(numbers)
+        return "POST", "/Create_User", {"Username": f"single{i}", "Email": f"single{i}@example.com",
+                                        "Password": PASSWORD, "Name": f"Single {i}"}
+
+    single = drive(create_user, counter, args.clients, args.import_rows)
+    print_table({"/Create_User": single})
+
+    body = "\n".join(json.dumps({"Username": f"bulk{i}", "Email": f"bulk{i}@example.com",
+                                 "Password": PASSWORD, "Name": f"Bulk {i}"}) for i in range(args.import_rows))
+    started = time.perf_counter()
+    response = app.test_client().post("/import_users", data=body, content_type="application/x-ndjson")
+    elapsed = time.perf_counter() - started
+    result = response.get_json()
+    print(f"/import_users: {args.import_rows} rows in {elapsed:.2f}s ({args.import_rows / elapsed:.0f} rows/s), "
+          f"status {response.status_code}, failed {result.get('failed')}")
+    print(f"/Create_User: {single['throughput']:.0f} rows/s, {single['rejected']} rejected with 503")
+    return 0 if response.status_code < 500 and not result.get('failed') else 1
+
+
+def run_workload(args, database, counter):
+    # /workload (một aggregation) so với cách cũ: /user_projects rồi /tasks cho từng project và lọc
+    # AssignedTo ở client, chia theo số project mà user tham gia
+    data = seed(database, args)
+    rng = random.Random(args.seed)
+    memberships = {}
+    for project in data['projects']:
+        for member in project['Members']:
+            memberships[member['MemberID']] = memberships.get(member['MemberID'], 0) + 1
+
+    client = app.test_client()
+
+    def fan_out(user_id):
+        if counter:
+            counter.reset()
+        started = time.perf_counter()
+        response = client.get(f"/user_projects?UserID={user_id}")
+        statuses = [response.status_code]
+        for project in response.get_json().get('projects', []):
+            tasks = client.get(f"/tasks?ProjectID={project['ProjectID']}")
+            statuses.append(tasks.status_code)
+            [task for task in tasks.get_json().get('tasks', []) if task['AssignedTo'] == str(user_id)]
+        return time.perf_counter() - started, max(statuses), counter.count if counter else None
+
+    def workload(user_id):
+        return send(client, counter, lambda: ("GET", f"/workload?UserID={user_id}&page_size=50", None))
+
+    results = {}
+    for low, high in ((1, 2), (3, 10), (11, 50), (51, None)):
+        users = [user_id for user_id, count in memberships.items() if count >= low and (high is None or count <= high)]
+        if not users:
+            continue
+        label = f"{low}-{high}" if high else f"{low}+"
+        for name, fn in (("fan-out", fan_out), ("/workload", workload)):
+            started = time.perf_counter()
+            samples = [fn(rng.choice(users)) for _ in range(args.requests)]
+            results[f"{name} [{label}]"] = summarize(samples, time.perf_counter() - started)
+    print("[n] = projects per user")
+    print_table(results)
+    return 0 if not any(result['errors'] for result in results.values()) else 1
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", default="routes",
+                        choices=["routes", "login-storm", "serialization", "search", "user-import", "workload"])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--mongo", default="mongodb://localhost:27017", help="MongoDB URI of a scratch mongod")
+    target.add_argument("--mongomock", action="store_true", help="Use an in-memory mongomock database")
+    parser.add_argument("--db", default="DOAN_NT106_bench", help="Database to seed (dropped and recreated)")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--projects", type=int, default=2000)
+    parser.add_argument("--tasks", type=int, default=200000)
+    parser.add_argument("--members", type=int, default=8, help="Typical members per project")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for membership and task skew")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--storm-clients", type=int, default=32, help="Concurrent logins in login-storm")
+    parser.add_argument("--requests", type=int, default=500, help="Measured requests per route")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--import-rows", type=int, default=1000, help="Users created in user-import")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions for serialization")
+    parser.add_argument("--routes", help="Comma-separated subset of routes")
+    parser.add_argument("--baseline", help="Fail if results regress against this baseline JSON")
+    parser.add_argument("--save-baseline", help="Write results as a new baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args(argv)
+
+
+def run(args):
+    if args.scenario == "serialization":
+        return run_serialization(args)
+
+    if args.db == "DOAN_NT106":
+        raise SystemExit("Refusing to seed the production database, pass a scratch --db.")
+
+    client, counter = connect(args)
+    database = use_database(client, args.db)
+    scenarios = {"routes": run_routes, "login-storm": run_login_storm, "search": run_search,
+                 "user-import": run_user_import, "workload": run_workload}
+    return scenarios[args.scenario](args, database, counter)
+
+
+if __name__ == "__main__":
+    sys.exit(run(parse_args()))
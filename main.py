@@ -1,10 +1,39 @@
-from flask import Flask, request, jsonify, session, render_template
-from pymongo import MongoClient
+from flask import (Blueprint, Flask, Response, current_app, g, has_request_context, request, jsonify, session,
+                   render_template, send_from_directory, stream_with_context)
+from flask.json.provider import DefaultJSONProvider
+from pymongo import (MongoClient, ReadPreference, ReplaceOne, ReturnDocument, UpdateOne, IndexModel, ASCENDING, TEXT,
+                     monitoring)
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from werkzeug.local import LocalProxy
 from werkzeug.security import generate_password_hash, check_password_hash
 from bson import ObjectId
-from datetime import datetime
+from datetime import datetime, timedelta
 import re
 import json
+import atexit
+import cProfile
+import csv
+import functools
+import gzip
+import hashlib
+import heapq
+import hmac
+import io
+import itertools
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import click
+
+try:
+    import brotli
+except ImportError:  # brotli là tùy chọn, không có thì chỉ dùng gzip
+    brotli = None
 
 class JSONEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -14,24 +43,822 @@ class JSONEncoder(json.JSONEncoder):
             return obj.isoformat()  # Convert datetime to ISO format
         return super(JSONEncoder, self).default(obj)
 
-app = Flask(__name__)
-app.secret_key = "your_secret_key"  # Bắt buộc cho session hoạt động
 
-# MongoDB Connection
-client = MongoClient('192.168.1.16', 27017)
-db = client.DOAN_NT106  # Database
-user_collection = db.user  # User Collection
-projects_collection = db.project  # Project Collection
+class JSONProvider(DefaultJSONProvider):
+    # Mọi response (jsonify, NDJSON) đi qua đây nên handler trả thẳng document từ MongoDB.
+    # ObjectId/datetime chuyển như JSONEncoder; date, UUID, Decimal, dataclass giữ cách của Flask
+    @staticmethod
+    def default(obj):
+        if isinstance(obj, ObjectId):
+            return str(obj)
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        return DefaultJSONProvider.default(obj)
+
+# Cấu hình mặc định, ghi đè bằng create_app(config) hoặc biến môi trường FLASK_<KEY>
+DEFAULT_CONFIG = {
+    "SECRET_KEY": "your_secret_key",  # Bắt buộc cho session hoạt động
+
+    # MongoDB; None = dùng mặc định của pymongo
+    "MONGO_URI": "mongodb://192.168.1.16:27017",
+    "MONGO_DB": "DOAN_NT106",
+    "MONGO_MAX_POOL_SIZE": 100,
+    "MONGO_MIN_POOL_SIZE": 0,
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": None,  # Thời gian tối đa chờ connection rảnh trong pool
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": None,
+    "MONGO_CONNECT_TIMEOUT_MS": None,
+    "MONGO_SOCKET_TIMEOUT_MS": None,
+    "MONGO_COMPRESSORS": None,  # vd: "zstd,snappy,zlib"
+    "REPORT_READ_PREFERENCE": "primary",  # "secondaryPreferred" để /project_report, /task_progress_report đọc từ secondary
+
+    # Tạo các index trong INDEXES khi create_app (thread nền, không chặn khởi động / lệnh flask)
+    "ENSURE_INDEXES": True,
+
+    # Metrics: cảnh báo N+1 khi một request gửi nhiều hơn số lệnh này (0 = tắt)
+    "QUERY_WARN_THRESHOLD": 20,
+
+    # Cache tên user
+    "NAME_CACHE_SIZE": 10000,
+    "NAME_CACHE_TTL": 300,  # giây
+
+    # Hash mật khẩu; hash cũ khác tham số sẽ được hash lại khi đăng nhập
+    "PASSWORD_HASH_METHOD": "scrypt:32768:8:1",
+    "HASH_POOL_KIND": "thread",  # "thread" hoặc "process"
+    "HASH_POOL_WORKERS": os.cpu_count() or 2,
+    "HASH_QUEUE_SIZE": 64,  # Số job tối đa đang chạy + đang chờ
+    "HASH_TIMEOUT": 10,  # giây
+
+    # Nén response
+    "COMPRESS_MIN_SIZE": 1024,  # bytes
+    "COMPRESS_LEVEL": 6,
+
+    # Profiling
+    "PROFILE_SAMPLE_RATE": 0.0,  # 0.01 = 1% request, cần đặt cả PROFILE_TOKEN
+    "PROFILE_TOKEN": None,  # Token cho header X-Profile-Token và các route /admin/profiles
+    "PROFILE_DIR": "profiles",
+    "PROFILE_KEEP": 20,
+
+    # Job đánh dấu task quá hạn / dự án Delayed
+    "OVERDUE_JOB_INTERVAL": 3600,  # giây, 0 = không chạy nền (vẫn chạy được bằng lệnh mark-overdue)
+    "OVERDUE_JOB_LEASE": 600,  # giây, lock tự hết hạn nếu worker đang chạy job bị chết
+    "OVERDUE_JOB_DRY_RUN": False,  # Chỉ đếm và log, không ghi
+
+    # Ngày cũ lưu dạng chuỗi 'YYYY-MM-DD'; đặt False sau khi `flask migrate-dates` chạy xong
+    # để truy vấn theo ngày chỉ còn điều kiện trên kiểu datetime
+    "LEGACY_STRING_DATES": True,
+
+    # Gom các update /update_task_progress trong bộ nhớ rồi ghi một lần (0 = tắt, ghi trực tiếp)
+    "PROGRESS_BUFFER_MS": 0,
+    "PROGRESS_BUFFER_MAX": 1000,  # Flush sớm khi buffer có nhiều TaskID như vậy
+
+    # Job xóa tasks của các project đã bị xóa mềm
+    "DELETION_JOB_INTERVAL": 10,  # giây, 0 = không chạy nền (vẫn chạy được bằng lệnh purge-deleted)
+    "DELETION_JOB_LEASE": 120,  # giây, được gia hạn sau mỗi batch
+    "DELETION_BATCH_SIZE": 1000,
+    "DELETION_RATE": 5000,  # task mỗi giây, 0 = không giới hạn
+
+    # Chuyển project Completed/Canceled có EndDate quá ARCHIVE_AFTER_DAYS ngày sang project_archive/tasks_archive
+    "ARCHIVE_AFTER_DAYS": 90,
+    "ARCHIVE_BATCH_SIZE": 500,  # project mỗi batch, cũng là số task mỗi lần chép/xóa
+    "ARCHIVE_JOB_INTERVAL": 0,  # giây, 0 = chỉ chạy bằng lệnh archive-projects
+    "ARCHIVE_JOB_LEASE": 600,
+
+    # GET /project_events (Server-Sent Events)
+    "PROJECT_EVENTS_SOURCE": "memory",  # "memory" hoặc "changestream" (cần replica set)
+    "PROJECT_EVENTS_HEARTBEAT": 15,  # giây
+    "PROJECT_EVENTS_QUEUE": 100,  # Sự kiện chờ tối đa mỗi subscriber, đầy thì gửi resync
+    "PROJECT_EVENTS_BACKLOG": 200,  # Sự kiện giữ lại mỗi project để resume bằng Last-Event-ID
+    "PROJECT_EVENTS_TIMEOUT": 300  # giây, đóng kết nối để client kết nối lại (0 = không giới hạn)
+}
+
+bp = Blueprint("main", __name__, cli_group=None)
+
+# ------------------------------- METRICS ------------------------------- #
+# Đếm lệnh MongoDB của từng request (số lệnh, tổng thời gian, lệnh chậm nhất) và xuất
+# dạng Prometheus ở /metrics. Request gửi quá QUERY_WARN_THRESHOLD lệnh sẽ bị log cảnh báo (N+1).
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250, 500)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}  # route -> ([số mẫu theo bucket], tổng, số mẫu)
+        self._lock = threading.Lock()
+
+    def observe(self, route, value):
+        with self._lock:
+            counts, total, count = self._series.get(route, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._series[route] = (counts, total + value, count + 1)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for route, (counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{{route="{route}",le="{bound}"}} {bucket_count}')
+                lines.append(f'{self.name}_bucket{{route="{route}",le="+Inf"}} {count}')
+                lines.append(f'{self.name}_sum{{route="{route}"}} {total}')
+                lines.append(f'{self.name}_count{{route="{route}"}} {count}')
+        return lines
+
+
+class CommandMetrics(monitoring.CommandListener):
+    # pymongo gọi listener trên chính thread thực hiện lệnh nên gắn được vào request hiện tại
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        self._record(event)
+
+    def _record(self, event):
+        if not has_request_context():
+            return
+        seconds = event.duration_micros / 1e6
+        stats = g.setdefault('mongo_stats', {"commands": 0, "seconds": 0.0, "slowest": None, "slowest_seconds": 0.0})
+        stats['commands'] += 1
+        stats['seconds'] += seconds
+        if seconds >= stats['slowest_seconds']:
+            stats['slowest'] = event.command_name
+            stats['slowest_seconds'] = seconds
+
+
+command_metrics = CommandMetrics()
+request_seconds = Histogram("http_request_duration_seconds", "Request latency by route.", LATENCY_BUCKETS)
+mongo_commands = Histogram("mongo_commands_per_request", "MongoDB commands issued per request.", COUNT_BUCKETS)
+mongo_seconds = Histogram("mongo_time_per_request_seconds", "Total MongoDB time per request.", LATENCY_BUCKETS)
+mongo_slowest = Histogram("mongo_slowest_command_seconds", "Slowest MongoDB command per request.", LATENCY_BUCKETS)
+progress_flush_seconds = Histogram("progress_buffer_flush_seconds", "Progress buffer flush latency.", LATENCY_BUCKETS)
+
+
+@bp.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@bp.after_app_request
+def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    stats = g.get('mongo_stats') or {"commands": 0, "seconds": 0.0, "slowest": None, "slowest_seconds": 0.0}
+    request_seconds.observe(route, time.perf_counter() - g.get('request_started', time.perf_counter()))
+    mongo_commands.observe(route, stats['commands'])
+    mongo_seconds.observe(route, stats['seconds'])
+    mongo_slowest.observe(route, stats['slowest_seconds'])
+
+    threshold = current_app.config['QUERY_WARN_THRESHOLD']
+    if threshold and stats['commands'] > threshold:
+        current_app.logger.warning("%s %s issued %d MongoDB commands (%.1f ms total, slowest %s %.1f ms)",
+                           request.method, route, stats['commands'], stats['seconds'] * 1000,
+                           stats['slowest'], stats['slowest_seconds'] * 1000)
+    return response
+
+
+@bp.route("/metrics", methods=['GET'])
+def metrics():
+    lines = []
+    for histogram in (request_seconds, mongo_commands, mongo_seconds, mongo_slowest, progress_flush_seconds):
+        lines.extend(histogram.render())
+
+    cache = name_cache.stats()
+    for key in ("hits", "misses", "evictions"):
+        lines.append(f"# TYPE name_cache_{key}_total counter")
+        lines.append(f"name_cache_{key}_total {cache[key]}")
+    lines.append("# TYPE name_cache_size gauge")
+    lines.append(f"name_cache_size {cache['size']}")
+    lines.append("# TYPE password_hash_rejected_total counter")
+    lines.append(f"password_hash_rejected_total {hash_pool.rejected}")
+
+    buffer = current_app.extensions.get('progress_buffer')
+    if buffer is not None:
+        lines.append("# TYPE progress_buffer_depth gauge")
+        lines.append(f"progress_buffer_depth {buffer.depth()}")
+        lines.append("# TYPE progress_buffer_flushed_total counter")
+        lines.append(f"progress_buffer_flushed_total {buffer.flushed}")
+        lines.append("# TYPE progress_buffer_flush_failures_total counter")
+        lines.append(f"progress_buffer_flush_failures_total {buffer.failures}")
+
+    events = current_app.extensions['project_events']
+    lines.append("# TYPE project_events_subscribers gauge")
+    lines.append(f"project_events_subscribers {events.subscriber_count()}")
+    lines.append("# TYPE project_events_published_total counter")
+    lines.append(f"project_events_published_total {events.published}")
+    lines.append("# TYPE project_events_dropped_total counter")
+    lines.append(f"project_events_dropped_total {events.dropped}")
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+
+# ------------------------------ PROFILING ------------------------------ #
+# Lấy mẫu cProfile cho một tỉ lệ request, hoặc cho request có header X-Profile-Token đúng.
+# Mỗi route giữ tối đa PROFILE_KEEP file .prof mới nhất trong PROFILE_DIR.
+# Khi PROFILE_SAMPLE_RATE = 0 và không có PROFILE_TOKEN thì không đăng ký hook nào.
+# PROFILE_SAMPLE_RATE cần có PROFILE_TOKEN: không có token thì file .prof không xem/tải được qua /admin/profiles.
+def profile_token_ok():
+    expected = current_app.config['PROFILE_TOKEN']
+    token = request.headers.get('X-Profile-Token')
+    return bool(expected) and token is not None and hmac.compare_digest(token, expected)
+
+
+def start_profile():
+    sample_rate = current_app.config['PROFILE_SAMPLE_RATE']
+    if not (profile_token_ok() or (sample_rate and random.random() < sample_rate)):
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:  # Đã có profiler khác đang chạy (vd: request song song)
+        return
+    g.profiler = profiler
+
+
+def finish_profile(response):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+    profiler.disable()
+
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    route_dir = os.path.join(current_app.config['PROFILE_DIR'], re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or "root")
+    os.makedirs(route_dir, exist_ok=True)
+    profiler.dump_stats(os.path.join(route_dir, f"{time.time_ns()}-{os.getpid()}.prof"))
+
+    # Ring buffer: xóa các file cũ nhất vượt quá PROFILE_KEEP
+    profiles = sorted(os.listdir(route_dir))
+    for name in profiles[:-current_app.config['PROFILE_KEEP']]:
+        try:
+            os.remove(os.path.join(route_dir, name))
+        except FileNotFoundError:
+            pass
+    return response
+
+
+def list_profiles():
+    if not profile_token_ok():
+        return jsonify({"error": "Valid X-Profile-Token header is required."}), 403
+    profile_dir = current_app.config['PROFILE_DIR']
+    profiles = []
+    if os.path.isdir(profile_dir):
+        for route in sorted(os.listdir(profile_dir)):
+            for name in sorted(os.listdir(os.path.join(profile_dir, route)), reverse=True):
+                stat = os.stat(os.path.join(profile_dir, route, name))
+                profiles.append({
+                    "route": route,
+                    "name": name,
+                    "size": stat.st_size,
+                    "created": datetime.utcfromtimestamp(stat.st_mtime),
+                    "url": f"/admin/profiles/{route}/{name}"
+                })
+    return jsonify({"profiles": profiles}), 200
+
+
+def download_profile(route, name):
+    if not profile_token_ok():
+        return jsonify({"error": "Valid X-Profile-Token header is required."}), 403
+    return send_from_directory(os.path.abspath(current_app.config['PROFILE_DIR']), f"{route}/{name}", as_attachment=True)
+
+
+def setup_profiling(app):
+    if app.config['PROFILE_SAMPLE_RATE'] and not app.config['PROFILE_TOKEN']:
+        raise ValueError("PROFILE_SAMPLE_RATE requires PROFILE_TOKEN to list and download profiles")
+    if app.config['PROFILE_SAMPLE_RATE'] or app.config['PROFILE_TOKEN']:
+        app.before_request(start_profile)
+        app.after_request(finish_profile)
+    if app.config['PROFILE_TOKEN']:
+        app.add_url_rule("/admin/profiles", "list_profiles", list_profiles, methods=['GET'])
+        app.add_url_rule("/admin/profiles/<route>/<name>", "download_profile", download_profile, methods=['GET'])
+
+
+
+# ------------------------- MongoDB Connection ------------------------- #
+# MongoClient được tạo lười trong từng process, nên các worker fork từ master của WSGI
+# server không dùng chung connection pool tạo trước khi fork.
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST
+}
+
+
+class MongoConnection:
+    def __init__(self, config, client=None):
+        self.config = config
+        self._client = client
+        self._pid = os.getpid() if client is not None else None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    self._client = MongoClient(self.config['MONGO_URI'], **self.client_options())
+                    self._pid = os.getpid()
+        return self._client
+
+    def client_options(self):
+        options = {
+            "maxPoolSize": self.config['MONGO_MAX_POOL_SIZE'],
+            "minPoolSize": self.config['MONGO_MIN_POOL_SIZE'],
+            "waitQueueTimeoutMS": self.config['MONGO_WAIT_QUEUE_TIMEOUT_MS'],
+            "serverSelectionTimeoutMS": self.config['MONGO_SERVER_SELECTION_TIMEOUT_MS'],
+            "connectTimeoutMS": self.config['MONGO_CONNECT_TIMEOUT_MS'],
+            "socketTimeoutMS": self.config['MONGO_SOCKET_TIMEOUT_MS'],
+            "compressors": self.config['MONGO_COMPRESSORS']
+        }
+        options = {key: value for key, value in options.items() if value is not None}
+        options['event_listeners'] = [command_metrics]
+        return options
+
+    @property
+    def db(self):
+        return self.client[self.config['MONGO_DB']]
+
+    @property
+    def report_db(self):
+        # Database cho các route báo cáo, có thể đọc từ secondary
+        read_preference = READ_PREFERENCES[self.config['REPORT_READ_PREFERENCE']]
+        return self.client.get_database(self.config['MONGO_DB'], read_preference=read_preference)
+
+
+def get_db():
+    return current_app.extensions['mongo'].db
+
+
+db = LocalProxy(get_db)  # Database
+user_collection = LocalProxy(lambda: get_db().user)  # User Collection
+projects_collection = LocalProxy(lambda: get_db().project)  # Project Collection
+report_db = LocalProxy(lambda: current_app.extensions['mongo'].report_db)  # Database cho route báo cáo
+
+# Project đã bị xóa mềm (đang chờ job xóa tasks) không hiện ở bất kỳ route đọc/ghi nào
+NOT_DELETED = {"Deleted": {"$ne": True}}
+
+# Số lần thử lại khi danh sách Members bị thay đổi đồng thời
+MEMBER_UPDATE_RETRIES = 5
+
+# Số phần tử tối đa trong một request bulk (/create_tasks, /update_tasks)
+BULK_MAX_ITEMS = 5000
+
+# Số dòng mỗi lần kiểm tra trùng + insert_many khi import user
+USER_IMPORT_CHUNK = 500
 
 # Regex for email validation
 EMAIL_REGEX = re.compile(r'^[^@]+@[^@]+\.[^@]+$')
 
-@app.route("/",methods=['GET'])
+# ------------------------------ INDEXES ------------------------------ #
+# Index cần cho các truy vấn chính, tạo khi khởi động hoặc bằng lệnh ensure-indexes
+INDEXES = {
+    "user": [
+        IndexModel([("Username", ASCENDING)], unique=True),
+        IndexModel([("Email", ASCENDING)], unique=True)
+    ],
+    "project": [
+        IndexModel([("Members.MemberID", ASCENDING)]),
+        IndexModel([("CreatedBy", ASCENDING)]),
+        IndexModel([("Status", ASCENDING), ("EndDate", ASCENDING)]),
+        IndexModel([("Deleted", ASCENDING)], sparse=True),
+        IndexModel([("ProjectName", TEXT), ("Description", TEXT)], weights={"ProjectName": 3})
+    ],
+    "tasks": [
+        IndexModel([("ProjectID", ASCENDING), ("Status", ASCENDING)]),
+        IndexModel([("ProjectID", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("AssignedTo", ASCENDING), ("DueDate", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("ProjectID", ASCENDING), ("Overdue", ASCENDING)]),
+        IndexModel([("Overdue", ASCENDING), ("DueDate", ASCENDING)])
+    ],
+    # Chỉ các index cần cho include_archived=1
+    "project_archive": [
+        IndexModel([("Members.MemberID", ASCENDING)]),
+        IndexModel([("CreatedBy", ASCENDING)])
+    ],
+    "tasks_archive": [
+        IndexModel([("ProjectID", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("ProjectID", ASCENDING), ("Overdue", ASCENDING)])
+    ]
+}
+
+
+def ensure_indexes():
+    # Trả về danh sách lỗi (vd: dữ liệu trùng làm index unique không tạo được)
+    errors = []
+    for collection_name, models in INDEXES.items():
+        try:
+            db[collection_name].create_indexes(models)
+        except OperationFailure as e:
+            errors.append(f"{collection_name}: {e}")
+    return errors
+
+
+def ensure_indexes_in_background(app):
+    # Cho create_app: chạy cả khi dùng `flask run` lẫn WSGI "main:create_app()".
+    # MongoDB chưa sẵn sàng thì chỉ log, ensure-indexes chạy lại được bất cứ lúc nào
+    def run():
+        with app.app_context():
+            try:
+                errors = ensure_indexes()
+            except Exception:
+                app.logger.exception("Failed to create indexes")
+                return
+            for error in errors:
+                app.logger.warning("Failed to create index on %s", error)
+
+    thread = threading.Thread(target=run, name="ensure-indexes", daemon=True)
+    thread.start()
+    return thread
+
+
+def index_audit_queries():
+    # Dạng truy vấn của từng route, giá trị chỉ là mẫu để chạy explain
+    sample_id = ObjectId()
+    return [
+        ("/login, /Create_User, /update_member_role", "user",
+         {"$or": [{"Username": "sample"}, {"Email": "sample"}]}),
+        ("/project_members (users)", "user",
+         {"$or": [{"Username": {"$in": ["sample"]}}, {"Email": {"$in": ["sample"]}}]}),
+        ("/user_projects, /task_progress_report", "project",
+         {"$or": [{"CreatedBy": sample_id}, {"Members.MemberID": sample_id}]}),
+        ("/search_projects", "project",
+         {"$or": [{"CreatedBy": sample_id}, {"Members.MemberID": sample_id}], "$text": {"$search": "sample"}}),
+        ("/tasks, /project (tasks)", "tasks",
+         {"ProjectID": sample_id}),
+        ("/task_progress_report (overdue)", "tasks",
+         {"ProjectID": {"$in": [sample_id]}, "Overdue": True}),
+        ("mark-overdue (tasks)", "tasks", overdue_task_filter(today())),
+        ("mark-overdue (cleared tasks)", "tasks", cleared_task_filter(today())),
+        ("mark-overdue (projects)", "project", delayed_project_filter(today())),
+        ("/workload", "tasks",
+         {"AssignedTo": sample_id, **date_range("DueDate", lte=today())})
+    ]
+
+
+def plan_stages(plan):
+    # Lấy tất cả các stage trong cây winningPlan của explain
+    if isinstance(plan, dict):
+        stages = [plan['stage']] if 'stage' in plan else []
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+        return stages
+    if isinstance(plan, list):
+        return [stage for item in plan for stage in plan_stages(item)]
+    return []
+
+
+@bp.cli.command("ensure-indexes")
+def ensure_indexes_command():
+    """Create the indexes declared in INDEXES."""
+    errors = ensure_indexes()
+    for error in errors:
+        click.echo(f"Failed to create index on {error}", err=True)
+    if errors:
+        sys.exit(1)
+    click.echo("Indexes are up to date.")
+
+
+@bp.cli.command("audit-indexes")
+def audit_indexes_command():
+    """Explain each route's query shape and report collection scans."""
+    collscans = 0
+    for route, collection_name, query in index_audit_queries():
+        explain = db[collection_name].find(query).explain()
+        stages = plan_stages(explain.get('queryPlanner', {}).get('winningPlan', {}))
+        if 'COLLSCAN' in stages:
+            collscans += 1
+            click.echo(f"COLLSCAN  {route}: {collection_name} {query}")
+        else:
+            click.echo(f"ok        {route}: {' -> '.join(stages)}")
+    if collscans:
+        sys.exit(1)
+
+# --------------------------- USER NAME CACHE --------------------------- #
+# Cache Name/Username theo _id cho các view hiển thị thành viên. Route nào sửa
+# Name hoặc Username của user phải gọi name_cache.invalidate([...]).
+
+
+class NameCache:
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # _id -> (expires_at, {"Name", "Username"})
+        self._lock = threading.Lock()
+        self._generation = 0  # tăng mỗi lần invalidate để bỏ kết quả đọc cũ
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_many(self, user_ids):
+        # {_id: {"Name", "Username"}}; user không tồn tại sẽ không có trong kết quả
+        now = time.monotonic()
+        found, missing = {}, []
+        with self._lock:
+            for user_id in set(user_ids):
+                entry = self._entries.get(user_id)
+                if entry and entry[0] > now:
+                    self._entries.move_to_end(user_id)
+                    found[user_id] = entry[1]
+                    self.hits += 1
+                else:
+                    missing.append(user_id)
+                    self.misses += 1
+            generation = self._generation
+
+        if missing:
+            users = list(user_collection.find({"_id": {"$in": missing}}, {"Name": 1, "Username": 1}))
+            self.put_many(users, generation)
+            found.update((user['_id'], self._entry(user)) for user in users)
+        return found
+
+    def put_many(self, users, generation=None):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            for user in users:
+                self._entries[user['_id']] = (expires_at, self._entry(user))
+                self._entries.move_to_end(user['_id'])
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_ids):
+        with self._lock:
+            self._generation += 1
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+    @staticmethod
+    def _entry(user):
+        return {"Name": user.get('Name', "Unknown"), "Username": user.get('Username')}
+
+
+name_cache = LocalProxy(lambda: current_app.extensions['name_cache'])
+
+
+@bp.route("/cache_stats", methods=['GET'])
+def cache_stats():
+    return jsonify({"name_cache": name_cache.stats()}), 200
+
+
+# --------------------------- PASSWORD HASHING --------------------------- #
+# generate/check_password_hash tốn CPU nên chạy trên pool riêng thay vì trên thread của request.
+# Hàng đợi có giới hạn: khi đầy thì trả 503 ngay để các route khác không bị ảnh hưởng.
+
+
+class HashPoolBusy(Exception):
+    pass
+
+
+class HashPool:
+    def __init__(self, kind, workers, queue_size, timeout):
+        self.kind = kind
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self.rejected = 0
+
+    def _get_executor(self):
+        # Tạo lười và tạo lại sau khi fork (worker của WSGI server)
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                executor_class = ProcessPoolExecutor if self.kind == "process" else ThreadPoolExecutor
+                self._executor = executor_class(max_workers=self.workers)
+                self._pid = os.getpid()
+            return self._executor
+
+    def submit(self, fn, *args, block=False):
+        if not self._slots.acquire(blocking=block):
+            self.rejected += 1
+            raise HashPoolBusy()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, fn, *args):
+        try:
+            return self.submit(fn, *args).result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise HashPoolBusy()
+
+
+hash_pool = LocalProxy(lambda: current_app.extensions['hash_pool'])
+
+
+def hash_password(password):
+    return hash_pool.run(generate_password_hash, password, current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def verify_password(stored_hash, password):
+    return hash_pool.run(check_password_hash, stored_hash, password)
+
+
+@functools.lru_cache(maxsize=None)
+def hash_method_prefix(method):
+    # "scrypt" hay "pbkdf2:sha256" được werkzeug mở rộng thành "scrypt:32768:8:1"...: lấy đúng tiền tố mà
+    # hash mới sẽ có. Tốn một lần hash cho mỗi method trong mỗi process
+    return generate_password_hash("", method).split('$', 1)[0]
+
+
+def needs_rehash(stored_hash):
+    return stored_hash.split('$', 1)[0] != hash_method_prefix(current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def busy_response():
+    return jsonify({"error": "Server is busy, please try again later."}), 503, {"Retry-After": "1"}
+
+
+# ---------------------------- COMPRESSION ---------------------------- #
+# Nén response lớn theo Accept-Encoding (brotli nếu có cài, nếu không thì gzip)
+
+
+@bp.after_app_request
+def compress_response(response):
+    if (not 200 <= response.status_code < 300 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers):
+        return response
+
+    data = response.get_data()
+    if len(data) < current_app.config['COMPRESS_MIN_SIZE']:
+        return response
+
+    level = current_app.config['COMPRESS_LEVEL']
+    if brotli is not None and request.accept_encodings['br']:
+        encoding, data = 'br', brotli.compress(data, quality=level)
+    elif request.accept_encodings['gzip']:
+        encoding, data = 'gzip', gzip.compress(data, level)
+    else:
+        return response
+
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    # Body đã khác bản gốc nên ETag chuyển thành weak (vẫn khớp với If-None-Match)
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+# ------------------------------- ETAGS ------------------------------- #
+# Mỗi project có Revision tăng ở mọi route ghi; các route GET trả ETag theo Revision
+# và trả 304 cho If-None-Match khớp mà không cần dựng lại response.
+def etag_for(*parts):
+    return hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def project_etag(project_id, *parts, access=None):
+    # None nếu project không tồn tại hoặc không khớp access (route tự xử lý như trước)
+    project = projects_collection.find_one({"_id": project_id, **NOT_DELETED, **(access or {})}, {"Revision": 1})
+    if not project:
+        return None
+    return etag_for(project_id, project.get('Revision', 0), *parts)
+
+
+def not_modified(etag):
+    if etag and request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    return None
+
+
+def with_etag(response, etag):
+    if etag:
+        response.set_etag(etag)
+    return response
+
+
+# ----------------------------- PAGINATION ----------------------------- #
+# Các route danh sách nhận ?limit=&after=<_id cuối trang trước>&fields=a,b&stream=1
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+
+
+def page_args():
+    # Trả về (limit, after, fields, error); limit None nghĩa là lấy hết như trước
+    limit = request.args.get('limit')
+    after = request.args.get('after')
+    fields = request.args.get('fields')
+
+    if limit is not None:
+        if not limit.isdigit() or not 1 <= int(limit) <= MAX_PAGE_SIZE:
+            return None, None, None, f"limit must be between 1 and {MAX_PAGE_SIZE}!"
+        limit = int(limit)
+
+    if after is not None:
+        if not ObjectId.is_valid(after):
+            return None, None, None, "Invalid after cursor!"
+        after = ObjectId(after)
+
+    if fields is not None:
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+        if not fields or any(field.startswith('$') for field in fields):
+            return None, None, None, "Invalid fields list!"
+
+    return limit, after, fields, None
+
+
+def wants_stream():
+    return request.args.get('stream') in ('1', 'true')
+
+
+def ndjson_response(docs):
+    # Mỗi document một dòng JSON, ghi ra ngay khi đọc được từ cursor
+    def generate():
+        for doc in docs:
+            yield current_app.json.dumps(doc) + "\n"
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def wants_archived():
+    return request.args.get('include_archived') in ('1', 'true')
+
+
+def merge_by_id(cursors, limit=None):
+    # Gộp các cursor đã sort theo _id (project và project_archive) thành một dãy theo _id
+    merged = heapq.merge(*cursors, key=lambda doc: doc['_id'])
+    return itertools.islice(merged, limit) if limit else merged
+
+
+# -------------------------------- DATES -------------------------------- #
+# StartDate, EndDate, DueDate lưu dạng datetime (00:00 UTC) nhưng vẫn trả về client dạng 'YYYY-MM-DD'
+DATE_FORMAT = '%Y-%m-%d'
+DATE_FIELDS = {"project": ("StartDate", "EndDate"), "tasks": ("DueDate",)}
+
+
+def parse_date(value):
+    # None/"" -> None, chuỗi sai định dạng -> ValueError
+    if value is None or value == "" or isinstance(value, datetime):
+        return value or None
+    return datetime.strptime(value, DATE_FORMAT)
+
+
+def format_date(value):
+    return value.strftime(DATE_FORMAT) if isinstance(value, datetime) else value
+
+
+def format_dates(doc):
+    for field in ("StartDate", "EndDate", "DueDate"):
+        if isinstance(doc.get(field), datetime):
+            doc[field] = doc[field].strftime(DATE_FORMAT)
+    return doc
+
+
+def date_range(field, **bounds):
+    # date_range("DueDate", lte="2024-01-31") -> điều kiện khớp cả giá trị datetime lẫn chuỗi chưa migrate
+    as_date = {f"${op}": datetime.strptime(value, DATE_FORMAT) for op, value in bounds.items()}
+    if not current_app.config['LEGACY_STRING_DATES']:
+        return {field: as_date}
+    as_string = {"$gt": "", **{f"${op}": value for op, value in bounds.items()}}
+    return {"$or": [{field: as_date}, {field: as_string}]}
+
+
+@bp.route("/",methods=['GET'])
 def index():
     return render_template('index.html')
 
 # ---------------------------- USER ROUTES ---------------------------- #
-@app.route("/Create_User", methods=['POST'])
+@bp.route("/Create_User", methods=['POST'])
 def create_user():
     # Get form data
     data = request.get_json()
@@ -54,7 +881,7 @@ def create_user():
             return jsonify({"error": "Username or Email already exists. Please try again!"}), 400
 
         # Hash password before storing
-        hashed_password = generate_password_hash(password)
+        hashed_password = hash_password(password)
 
         # Insert user into database
         user_collection.insert_one({
@@ -66,11 +893,13 @@ def create_user():
             'CreateDate': datetime.utcnow()
         })
         return jsonify({"message": "User created successfully!"}), 201
+    except HashPoolBusy:
+        return busy_response()
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/login", methods=['POST'])
+@bp.route("/login", methods=['POST'])
 def login():
     data = request.get_json()
     identifier = data.get('Identifier')  # Username or Email
@@ -84,7 +913,22 @@ def login():
         "$or": [{"Username": identifier}, {"Email": identifier}]
     })
 
-    if user and check_password_hash(user['Password'], password):
+    try:
+        valid_password = user is not None and verify_password(user['Password'], password)
+    except HashPoolBusy:
+        return busy_response()
+
+    if valid_password:
+        # Hash lại mật khẩu lưu theo tham số cũ, nếu pool đang bận thì để lần đăng nhập sau
+        if needs_rehash(user['Password']):
+            try:
+                user_collection.update_one(
+                    {"_id": user['_id'], "Password": user['Password']},
+                    {"$set": {"Password": hash_password(password)}}
+                )
+            except HashPoolBusy:
+                pass
+
         # Set session data
         session['user_id'] = str(user['_id'])
         session['username'] = user['Username']
@@ -97,8 +941,132 @@ def login():
         return jsonify({"error": "Invalid username/email or password!"}), 401
 
 
+# ---------------------------- USER IMPORT ---------------------------- #
+# Import nhiều user từ CSV (header Username,Email,Password,Name) hoặc NDJSON (mỗi dòng một object).
+# Mỗi chunk: một query $in kiểm tra trùng với DB, hash song song trên hash_pool, một insert_many.
+def read_user_rows(stream, fmt):
+    if fmt == "csv":
+        yield from csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+        return
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+def import_users(rows, chunk_size=USER_IMPORT_CHUNK):
+    seen = (set(), set())  # Username, Email đã gặp trong lần import này
+    results = []
+    for chunk in batched(enumerate(rows), chunk_size):
+        results.extend(import_user_chunk(chunk, seen))
+    return results
+
+
+def import_user_chunk(chunk, seen):
+    seen_usernames, seen_emails = seen
+    results = {index: {"index": index} for index, _ in chunk}
+    users = {}  # index -> document
+    for index, row in chunk:
+        if not isinstance(row, dict):
+            results[index]['error'] = "Invalid row."
+            continue
+        username, email, password, name = (row.get(key) for key in ("Username", "Email", "Password", "Name"))
+        if not username or not email or not password or not name:
+            results[index]['error'] = "All fields are required!"
+        elif not EMAIL_REGEX.match(email):
+            results[index]['error'] = "Invalid email format!"
+        elif username in seen_usernames or email in seen_emails:
+            results[index]['error'] = "Duplicate Username or Email in import."
+        else:
+            seen_usernames.add(username)
+            seen_emails.add(email)
+            users[index] = {
+                'Username': username,
+                'Email': email,
+                'Password': password,
+                'Name': name,
+                'role': 'user',  # Default role
+                'CreateDate': datetime.utcnow()
+            }
+
+    if users:
+        existing = user_collection.find({"$or": [
+            {"Username": {"$in": [user['Username'] for user in users.values()]}},
+            {"Email": {"$in": [user['Email'] for user in users.values()]}}
+        ]}, {"Username": 1, "Email": 1})
+        taken_usernames, taken_emails = set(), set()
+        for user in existing:
+            taken_usernames.add(user.get('Username'))
+            taken_emails.add(user.get('Email'))
+        for index, user in list(users.items()):
+            if user['Username'] in taken_usernames or user['Email'] in taken_emails:
+                results[index]['error'] = "Username or Email already exists."
+                del users[index]
+
+    # Chỉ dùng tối đa `workers` slot của hash_pool để /login, /Create_User vẫn còn chỗ trong hàng đợi
+    method = current_app.config['PASSWORD_HASH_METHOD']
+    for wave in batched(list(users), hash_pool.workers):
+        futures = [(index, hash_pool.submit(generate_password_hash, users[index]['Password'], method, block=True))
+                   for index in wave]
+        for index, future in futures:
+            users[index]['Password'] = future.result()
+
+    order = list(users)
+    write_errors = {}
+    if order:
+        try:
+            user_collection.insert_many([users[index] for index in order], ordered=False)
+        except BulkWriteError as e:
+            for error in e.details['writeErrors']:
+                duplicate = error.get('code') == 11000  # Bị tạo đồng thời sau lúc kiểm tra
+                write_errors[order[error['index']]] = "Username or Email already exists." if duplicate else error['errmsg']
+    for index in order:
+        if index in write_errors:
+            results[index]['error'] = write_errors[index]
+        else:
+            results[index]['UserID'] = users[index]['_id']
+    return [results[index] for index, _ in chunk]
+
+
+@bp.route("/import_users", methods=['POST'])
+def import_users_route():
+    formats = {"text/csv": "csv", "application/x-ndjson": "ndjson", "application/jsonl": "ndjson"}
+    fmt = formats.get(request.mimetype)
+    if fmt is None:
+        return jsonify({"error": "Content-Type must be text/csv or application/x-ndjson!"}), 415
+
+    try:
+        return bulk_response(import_users(read_user_rows(request.stream, fmt)), 201)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.cli.command("import-users")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(["csv", "ndjson"]), default=None,
+              help="Input format, guessed from the file extension by default.")
+def import_users_command(path, fmt):
+    """Import users from a CSV or NDJSON file."""
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "ndjson")
+    started = time.perf_counter()
+    with open(path, "rb") as stream:
+        results = import_users(read_user_rows(stream, fmt))
+    elapsed = time.perf_counter() - started
+
+    failed = [result for result in results if 'error' in result]
+    for result in failed:
+        click.echo(f"row {result['index']}: {result['error']}", err=True)
+    click.echo(f"Imported {len(results) - len(failed)} of {len(results)} users in {elapsed:.1f}s "
+               f"({len(results) / elapsed if elapsed else 0:.0f} rows/s).")
+    if failed:
+        sys.exit(1)
+
+
 # --------------------------- PROJECT ROUTES --------------------------- #
-@app.route("/createproject", methods=['POST'])
+@bp.route("/createproject", methods=['POST'])
 def create_project():
     data = request.get_json()
     project_name = data.get('ProjectName')
@@ -120,6 +1088,12 @@ def create_project():
     if not ObjectId.is_valid(created_by):
         return jsonify({"error": "Invalid creator ID."}), 400
 
+    try:
+        start_date = parse_date(start_date)
+        end_date = parse_date(end_date)
+    except ValueError:
+        return jsonify({"error": "Invalid date format! Use YYYY-MM-DD."}), 400
+
     # Validate creator exists
     creator = user_collection.find_one({"_id": ObjectId(created_by)})
     if not creator:
@@ -137,7 +1111,9 @@ def create_project():
         'CreateDate': create_date,
         'Members': [
             {'MemberID': ObjectId(created_by), 'Role': 'Owner'}  # Thêm người tạo vào Members
-        ]
+        ],
+        'TaskCounts': {'Total': 0},
+        'Revision': 0  # Tăng mỗi khi project, thành viên hoặc task thay đổi, dùng làm ETag
     }
 
     try:
@@ -148,7 +1124,7 @@ def create_project():
 
 
 
-@app.route("/project_members", methods=['POST'])
+@bp.route("/project_members", methods=['POST'])
 def add_project_members():
     data = request.get_json()
     admin_id = data.get('AdminID')
@@ -163,7 +1139,7 @@ def add_project_members():
         return jsonify({"error": "Invalid ID format."}), 400
 
     # Kiểm tra dự án tồn tại
-    project = projects_collection.find_one({"_id": ObjectId(project_id)})
+    project = projects_collection.find_one({"_id": ObjectId(project_id), **NOT_DELETED})
     if not project:
         return jsonify({"error": "Project not found."}), 404
 
@@ -179,42 +1155,50 @@ def add_project_members():
         return jsonify({"error": "Only Admin or Creator can add project members."}), 403
 
     # Lọc danh sách user từ identifiers
-    users = user_collection.find({"$or": [{"Username": {"$in": identifiers}}, {"Email": {"$in": identifiers}}]})
+    users = user_collection.find({"$or": [{"Username": {"$in": identifiers}}, {"Email": {"$in": identifiers}}]},
+                                 {"Username": 1, "Name": 1})
     users = list(users)  # Chuyển cursor thành list để xử lý
     if not users:
         return jsonify({"error": "No users found with provided identifiers."}), 404
+    name_cache.put_many(users)  # Các user này sẽ được hiển thị ngay trong /project
 
-    # Tạo danh sách members chưa tồn tại trong project
-    new_members = []
-    for user in users:
-        member_id = user['_id']
-        # Kiểm tra xem user đã là thành viên chưa
-        existing_member = projects_collection.find_one({
-            "_id": ObjectId(project_id),
-            "Members.MemberID": member_id
-        })
-        if not existing_member:
-            new_members.append({"MemberID": member_id, "Role": member_role})
-
-    if not new_members:
-        return jsonify({"error": "All members are already in the project."}), 400
-
-    # Thêm các thành viên mới vào project
     try:
-        projects_collection.update_one(
-            {"_id": ObjectId(project_id)},
-            {"$push": {"Members": {"$each": new_members}}}
-        )
-        return jsonify({
-            "message": "Members added successfully!",
-            "added_members": [user['Username'] for user in users]
-        }), 201
+        for _ in range(MEMBER_UPDATE_RETRIES):
+            # Tạo danh sách members chưa tồn tại trong project từ Members đã đọc
+            existing_ids = {member['MemberID'] for member in project.get('Members', [])}
+            new_members = [{"MemberID": user['_id'], "Role": member_role}
+                           for user in users if user['_id'] not in existing_ids]
+
+            if not new_members:
+                return jsonify({"error": "All members are already in the project."}), 400
+
+            # Thêm các thành viên mới vào project; điều kiện $nin đảm bảo không push trùng
+            # nếu một request khác vừa thêm cùng user, khi đó đọc lại Members và tính lại
+            updated = projects_collection.find_one_and_update(
+                {"_id": ObjectId(project_id), **NOT_DELETED,
+                 "Members.MemberID": {"$nin": [member['MemberID'] for member in new_members]}},
+                {"$push": {"Members": {"$each": new_members}}, "$inc": {"Revision": 1}},
+                projection={"Revision": 1},
+                return_document=ReturnDocument.AFTER
+            )
+            if updated:
+                publish_event(updated['_id'], "members", updated['Revision'])
+                return jsonify({
+                    "message": "Members added successfully!",
+                    "added_members": [user['Username'] for user in users]
+                }), 201
+
+            project = projects_collection.find_one({"_id": ObjectId(project_id), **NOT_DELETED}, {"Members": 1})
+            if not project:
+                return jsonify({"error": "Project not found."}), 404
+
+        return jsonify({"error": "Project members changed concurrently, please try again."}), 409
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 
-@app.route("/project", methods=['GET'])
+@bp.route("/project", methods=['GET'])
 def view_project():
     project_id = request.args.get('ProjectID')
     user_id = request.args.get('UserID')
@@ -225,7 +1209,21 @@ def view_project():
     if not ObjectId.is_valid(project_id) or not ObjectId.is_valid(user_id):
         return jsonify({"error": "Invalid ID format!"}), 400
 
-    project = projects_collection.find_one({"_id": ObjectId(project_id)})
+    # Client gửi If-None-Match thì chỉ cần đọc Revision của project. ETag tự tính được nên điều kiện quyền
+    # nằm luôn trong truy vấn: người ngoài project đi tiếp xuống dưới và nhận 403 như bình thường
+    if request.if_none_match:
+        member = {"$or": [{"CreatedBy": ObjectId(user_id)}, {"Members.MemberID": ObjectId(user_id)}]}
+        cached = not_modified(project_etag(ObjectId(project_id), access=member))
+        if cached:
+            return cached
+
+    # One query for the project, one for its tasks (after the access check); names come from name_cache.
+    # Không dùng $lookup: tất cả tasks nằm trong một document kết quả sẽ vượt giới hạn 16 MB với project lớn
+    tasks_collection = db.tasks
+    project = projects_collection.find_one({"_id": ObjectId(project_id), **NOT_DELETED})
+    if not project and wants_archived():
+        project = db.project_archive.find_one({"_id": ObjectId(project_id)})
+        tasks_collection = db.tasks_archive
     if not project:
         return jsonify({"error": "Project not found."}), 404
 
@@ -234,47 +1232,43 @@ def view_project():
     if not is_member and str(project.get('CreatedBy')) != user_id:
         return jsonify({"error": "Access denied. You are not a member of this project."}), 403
 
+    project['Tasks'] = list(tasks_collection.find({"ProjectID": project['_id']}))
+
+    # Creator and member names, only cache misses go to MongoDB (one $in query)
+    users = name_cache.get_many([project['CreatedBy']] + [member['MemberID'] for member in project.get('Members', [])])
+    user_names = {user_id: user.get('Name', "Unknown") for user_id, user in users.items()}
+
     # Get the creator's name
-    creator = user_collection.find_one({"_id": ObjectId(project['CreatedBy'])})
+    creator = users.get(project['CreatedBy'])
     creator_name = creator.get('Name') if creator else "Unknown"
 
     # Fetch members' details
     members = []
     for member in project.get('Members', []):
-        user = user_collection.find_one({"_id": ObjectId(member['MemberID'])})
         members.append({
-            "MemberID": str(member['MemberID']),
-            "Name": user.get('Name', "Unknown") if user else "Unknown",
+            "MemberID": member['MemberID'],
+            "Name": user_names.get(member['MemberID'], "Unknown"),
             "Role": member['Role']
         })
 
-    # Fetch tasks for the project
-    tasks = list(db.tasks.find({"ProjectID": ObjectId(project_id)}))
-    for task in tasks:
-        task['_id'] = str(task['_id'])
-        task['AssignedTo'] = str(task['AssignedTo'])
-        task['ProjectID'] = str(task['ProjectID'])
-        task['CreateDate'] = task['CreateDate'].isoformat()
-        if 'DueDate' in task:
-            task['DueDate'] = task['DueDate']
-
     # Build the response
     response = {
         "ProjectName": project['ProjectName'],
         "Description": project['Description'],
-        "StartDate": project['StartDate'],
-        "EndDate": project.get('EndDate'),
+        "StartDate": format_date(project['StartDate']),
+        "EndDate": format_date(project.get('EndDate')),
         "Status": project['Status'],
         "CreatedBy": creator_name,
-        "CreateDate": project['CreateDate'].isoformat(),
-        "Tasks": tasks,  # Include tasks in the project
+        "CreateDate": project['CreateDate'],
+        "Tasks": [format_dates(task) for task in project['Tasks']],  # Include tasks in the project
         "Members": members  # Include members with roles
     }
-    return jsonify(response), 200
+    etag = etag_for(project['_id'], project.get('Revision', 0))
+    return with_etag(jsonify(response), etag), 200
 
 
 
-@app.route("/user_projects", methods=['GET'])
+@bp.route("/user_projects", methods=['GET'])
 def user_projects():
     user_id = request.args.get('UserID')
     
@@ -284,57 +1278,107 @@ def user_projects():
     if not ObjectId.is_valid(user_id):
         return jsonify({"error": "Invalid UserID format!"}), 400
 
+    limit, after, fields, error = page_args()
+    if error:
+        return jsonify({"error": error}), 400
+
     try:
         # Lấy tất cả các dự án mà người dùng tạo ra hoặc tham gia
-        projects = list(projects_collection.find({
+        membership = {
             "$or": [
                 {"CreatedBy": ObjectId(user_id)},
                 {"Members.MemberID": ObjectId(user_id)}
-            ]
-        }))
+            ],
+            **NOT_DELETED
+        }
 
-        if not projects:
-            return jsonify({"message": "No projects found for this user."}), 404
+        sources = [projects_collection, db.project_archive] if wants_archived() else [projects_collection]
+
+        # ETag từ (_id, Revision) của các project; thêm/xóa project hay thành viên đều làm ETag đổi
+        revisions = merge_by_id(source.find(membership, {"Revision": 1}).sort("_id", ASCENDING) for source in sources)
+        etag = etag_for(request.query_string, *(
+            f"{project['_id']}:{project.get('Revision', 0)}" for project in revisions
+        ))
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
+        query = dict(membership)
+        if after:
+            query["_id"] = {"$gt": after}
+
+        # Chỉ lấy entry Members của chính user này thay vì cả danh sách thành viên
+        projection = {
+            "ProjectName": 1, "Description": 1, "Status": 1, "StartDate": 1, "EndDate": 1,
+            "CreatedBy": 1, "CreateDate": 1,
+            "Members": {"$elemMatch": {"MemberID": ObjectId(user_id)}}
+        }
+        cursors = [source.find(query, projection).sort("_id", ASCENDING) for source in sources]
+        if limit:
+            cursors = [cursor.limit(limit) for cursor in cursors]
+
+        if wants_stream():
+            cursor = merge_by_id((cursor.batch_size(STREAM_BATCH_SIZE) for cursor in cursors), limit)
+            return ndjson_response(
+                project
+                for batch in batched(cursor, STREAM_BATCH_SIZE)
+                for project in user_project_rows(batch, user_id, fields)
+            )
 
-        # Lấy danh sách UserID của những người tạo dự án
-        creator_ids = {project['CreatedBy'] for project in projects}
-        creators = user_collection.find({"_id": {"$in": list(creator_ids)}})
-        creator_map = {str(creator['_id']): creator['Name'] for creator in creators}
+        projects = list(merge_by_id(cursors, limit))
 
-        # Chuẩn bị dữ liệu trả về
-        result = []
-        for project in projects:
-            # Tìm role của người dùng trong project
-            user_role = None
-            if project['CreatedBy'] == ObjectId(user_id):
-                user_role = "Creator"
-            else:  # Nếu không phải Creator, tìm role trong Members
-                for member in project.get('Members', []):
-                    if member['MemberID'] == ObjectId(user_id):
-                        user_role = member.get('Role', "Member")
-                        break
-
-            # Xác định quyền nếu user là Admin
-            if user_role == "Creator":
-                user_role = "Admin/Creator"  # Đánh dấu rõ quyền tương tự
-
-            creator_name = creator_map.get(str(project['CreatedBy']), "Unknown")  # Default là "Unknown"
-            result.append({
-                "ProjectID": str(project['_id']),
-                "ProjectName": project['ProjectName'],
-                "Description": project['Description'],
-                "Status": project['Status'],
-                "StartDate": project['StartDate'],
-                "EndDate": project.get('EndDate', None),
-                "CreatedBy": creator_name,  # Thay CreatedBy bằng tên
-                "CreateDate": project['CreateDate'].isoformat(),
-                "UserRole": user_role  # Thêm role của user trong project
-            })
+        if not projects and not after:
+            return jsonify({"message": "No projects found for this user."}), 404
 
-        return jsonify({"projects": result}), 200
+        response = {"projects": user_project_rows(projects, user_id, fields)}
+        if limit:
+            response["next"] = projects[-1]['_id'] if len(projects) == limit else None
+        return with_etag(jsonify(response), etag), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-@app.route("/update_member_role", methods=['PUT'])
+
+
+def user_project_rows(projects, user_id, fields=None):
+    # Lấy tên của những người tạo dự án
+    creators = name_cache.get_many(project['CreatedBy'] for project in projects)
+    creator_map = {creator_id: creator['Name'] for creator_id, creator in creators.items()}
+
+    # Chuẩn bị dữ liệu trả về
+    result = []
+    for project in projects:
+        # Tìm role của người dùng trong project
+        user_role = None
+        if project['CreatedBy'] == ObjectId(user_id):
+            user_role = "Creator"
+        else:  # Nếu không phải Creator, tìm role trong Members
+            for member in project.get('Members', []):
+                if member['MemberID'] == ObjectId(user_id):
+                    user_role = member.get('Role', "Member")
+                    break
+
+        # Xác định quyền nếu user là Admin
+        if user_role == "Creator":
+            user_role = "Admin/Creator"  # Đánh dấu rõ quyền tương tự
+
+        creator_name = creator_map.get(project['CreatedBy'], "Unknown")  # Default là "Unknown"
+        row = {
+            "ProjectID": project['_id'],
+            "ProjectName": project['ProjectName'],
+            "Description": project['Description'],
+            "Status": project['Status'],
+            "StartDate": format_date(project['StartDate']),
+            "EndDate": format_date(project.get('EndDate', None)),
+            "CreatedBy": creator_name,  # Thay CreatedBy bằng tên
+            "CreateDate": project['CreateDate'],
+            "UserRole": user_role  # Thêm role của user trong project
+        }
+        if fields:
+            row = {key: value for key, value in row.items() if key == "ProjectID" or key in fields}
+        result.append(row)
+    return result
+
+
+@bp.route("/update_member_role", methods=['PUT'])
 def update_member_role():
     data = request.get_json()
     admin_id = data.get('AdminID')  # ID của người thực hiện thay đổi
@@ -356,61 +1400,78 @@ def update_member_role():
     
     try:
         # Tìm thành viên dựa trên Username hoặc Email
-        member = user_collection.find_one({"$or": [{"Username": identifier}, {"Email": identifier}]})
+        member = user_collection.find_one({"$or": [{"Username": identifier}, {"Email": identifier}]}, {"_id": 1})
         if not member:
             return jsonify({"error": "Member not found with the provided Username or Email."}), 404
 
         member_id = member['_id']  # Lấy MemberID từ kết quả truy vấn
+        admin_id = ObjectId(admin_id)
+
+        # Kiểm tra quyền và cập nhật trong cùng một lệnh ghi:
+        # Creator sửa được mọi role; Admin chỉ sửa Member/Viewer và không được gán Owner
+        allowed = [{"CreatedBy": admin_id}]
+        if new_role != 'Owner':
+            allowed.append({"$and": [
+                {"Members": {"$elemMatch": {"MemberID": admin_id, "Role": "Admin"}}},
+                {"Members": {"$elemMatch": {"MemberID": member_id, "Role": {"$nin": ["Owner", "Admin"]}}}}
+            ]})
+
+        for _ in range(MEMBER_UPDATE_RETRIES):
+            project = projects_collection.find_one_and_update(
+                {"_id": ObjectId(project_id), **NOT_DELETED, "Members.MemberID": member_id, "$or": allowed},
+                {"$set": {"Members.$[target].Role": new_role}, "$inc": {"Revision": 1}},
+                projection={"Revision": 1},
+                array_filters=[{"target.MemberID": member_id}],
+                return_document=ReturnDocument.AFTER
+            )
+            if project:
+                publish_event(project['_id'], "members", project['Revision'])
+                return jsonify({"message": "Member role updated successfully!"}), 200
+
+            # Không cập nhật được: đọc project để trả đúng lỗi như trước
+            project = projects_collection.find_one({"_id": ObjectId(project_id), **NOT_DELETED},
+                                                   {"CreatedBy": 1, "Members": 1})
+            error = member_role_error(project, admin_id, member_id, new_role)
+            if error:
+                return error
+        return jsonify({"error": "Project members changed concurrently, please try again."}), 409
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        # Lấy thông tin dự án
-        project = projects_collection.find_one({"_id": ObjectId(project_id)})
-        if not project:
-            return jsonify({"error": "Project not found."}), 404
-
-        # Lấy danh sách members
-        members = project.get('Members', [])
-        admin_role = next((member['Role'] for member in members if member['MemberID'] == ObjectId(admin_id)), None)
-        target_member_role = next((member['Role'] for member in members if member['MemberID'] == ObjectId(member_id)), None)
-         # Kiểm tra quyền của Admin hoặc Creator
-        if project['CreatedBy'] == ObjectId(admin_id):
-            admin_role = "Creator"
-        else:
-            admin_in_project = next((member for member in project.get('Members', []) 
-                                    if member['MemberID'] == ObjectId(admin_id) and member['Role'] == 'Admin'), None)
-            admin_role = "Admin" if admin_in_project else None
 
-        # Kiểm tra xem AdminID có quyền hay không
-        if admin_role not in ['Admin', 'Owner','Creator']:
-            return jsonify({"error": "Only Admin or Creator can update member roles."}), 403
+def member_role_error(project, admin_id, member_id, new_role):
+    # Các lỗi của update_member_role theo đúng thứ tự kiểm tra; None nếu lẽ ra đã cập nhật được
+    if not project:
+        return jsonify({"error": "Project not found."}), 404
 
-        # Creator (Owner) có quyền tối cao
-        if admin_role == 'Owner' or admin_role=='Creator':
-            # Creator có thể chỉnh sửa tất cả các role, bao gồm Admin
-            pass
-        elif admin_role == 'Admin':
-            # Admin không thể chỉnh sửa hoặc xóa role của Creator
-            if target_member_role == 'Owner':
-                return jsonify({"error": "Admin cannot change or remove the role of the Creator (Owner)."}), 403
-            # Admin chỉ được phép chỉnh sửa các thành viên cấp dưới (Member, Viewer)
-            if target_member_role == 'Admin':
-                return jsonify({"error": "Admin cannot change the role of another Admin."}), 403
-        if admin_role == 'Admin' and new_role == 'Owner':
+    members = project.get('Members', [])
+    target_member_role = next((member['Role'] for member in members if member['MemberID'] == member_id), None)
+    # Kiểm tra quyền của Admin hoặc Creator
+    if project['CreatedBy'] == admin_id:
+        admin_role = "Creator"
+    else:
+        admin_in_project = next((member for member in members
+                                 if member['MemberID'] == admin_id and member['Role'] == 'Admin'), None)
+        admin_role = "Admin" if admin_in_project else None
+
+    if admin_role not in ['Admin', 'Creator']:
+        return jsonify({"error": "Only Admin or Creator can update member roles."}), 403
+
+    if admin_role == 'Admin':
+        # Admin không thể chỉnh sửa hoặc xóa role của Creator
+        if target_member_role == 'Owner':
+            return jsonify({"error": "Admin cannot change or remove the role of the Creator (Owner)."}), 403
+        # Admin chỉ được phép chỉnh sửa các thành viên cấp dưới (Member, Viewer)
+        if target_member_role == 'Admin':
+            return jsonify({"error": "Admin cannot change the role of another Admin."}), 403
+        if new_role == 'Owner':
             return jsonify({"error": "Admin cannot change another user's role to Owner."}), 403
-        # if admin_id==member_id:
-        #     return jsonify({"error": "Cannot change your own role."})
-        # Cập nhật vai trò của thành viên
-        result = projects_collection.update_one(
-            {"_id": ObjectId(project_id), "Members.MemberID": ObjectId(member_id)},
-            {"$set": {"Members.$.Role": new_role}}
-        )
-        if result.matched_count == 0:
-            return jsonify({"error": "Failed to update member role."}), 500
 
-        return jsonify({"message": "Member role updated successfully!"}), 200
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    if target_member_role is None:
+        return jsonify({"error": "Failed to update member role."}), 500
+    return None
 
-@app.route("/deleteproject", methods=['DELETE'])
+@bp.route("/deleteproject", methods=['DELETE'])
 def delete_project():
     data = request.get_json()
     admin_id = data.get('AdminID')  # ID of the user attempting to delete the project
@@ -423,37 +1484,1011 @@ def delete_project():
         return jsonify({"error": "Invalid ID format!"}), 400
 
     try:
-        # Fetch the project
-        project = projects_collection.find_one({"_id": ObjectId(project_id)})
-        if not project:
-            return jsonify({"error": "Project not found."}), 404
+        # Chỉ Creator hoặc Owner được xóa, kiểm tra ngay trong điều kiện ghi.
+        # Project chỉ bị đánh dấu Deleted (ẩn khỏi mọi route), job purge-deleted xóa tasks rồi xóa project.
+        now = datetime.utcnow()
+        deleted = projects_collection.find_one_and_update({
+            "_id": ObjectId(project_id),
+            **NOT_DELETED,
+            "$or": [
+                {"CreatedBy": ObjectId(admin_id)},
+                {"Members": {"$elemMatch": {"MemberID": ObjectId(admin_id), "Role": "Owner"}}}
+            ]
+        }, {"$set": {"Deleted": True, "DeletedAt": now}, "$inc": {"Revision": 1}},
+            projection={"Revision": 1}, return_document=ReturnDocument.AFTER)
+        if not deleted:
+            if not projects_collection.find_one({"_id": ObjectId(project_id), **NOT_DELETED}, {"_id": 1}):
+                return jsonify({"error": "Project not found."}), 404
+            return jsonify({"error": "Only the Creator or Owner can delete the project."}), 403
 
-        # Check if the admin_id is the creator of the project
-        if project['CreatedBy'] == ObjectId(admin_id):
-            user_role = "Creator"
+        track_deletion(ObjectId(project_id), now, ObjectId(admin_id))
+        publish_event(deleted['_id'], "deleted", deleted['Revision'])
+        return jsonify({"message": "Project deleted successfully!",
+                        "status_url": f"/deletion_status?ProjectID={project_id}"}), 202
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.route("/deletion_status", methods=['GET'])
+def deletion_status():
+    project_id = request.args.get('ProjectID')
+
+    if not project_id or not ObjectId.is_valid(project_id):
+        return jsonify({"error": "Valid ProjectID is required!"}), 400
+
+    try:
+        deletion = db.deletions.find_one({"_id": ObjectId(project_id)})
+        if not deletion:
+            return jsonify({"error": "No deletion found for this project."}), 404
+        deletion['ProjectID'] = deletion.pop('_id')
+        return jsonify({"deletion": deletion}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# --------------------------- TASK COUNTERS --------------------------- #
+# Mỗi project giữ TaskCounts = {"Total": n, "<Status>": n} để báo cáo không phải đọc toàn bộ tasks.
+# create_task / update_task cập nhật bằng $inc; lệnh reconcile-task-counts đếm lại khi bị lệch.
+# Project cũ chưa có TaskCounts thì chỉ tăng Revision: $inc sẽ tạo TaskCounts thiếu (vd: {"Total": 1})
+# và báo cáo sẽ tin vào đó thay vì đếm lại. Các project này được đếm lại cho tới khi chạy reconcile.
+def task_counter_field(status):
+    # Status do client gửi lên nên không dùng làm field path nếu có ký tự đặc biệt
+    if not isinstance(status, str) or not status or '.' in status or status.startswith('$'):
+        return None
+    return f"TaskCounts.{status}"
+
+
+def count_tasks(project_ids=None, database=None):
+    # Đếm lại trực tiếp từ tasks: {ProjectID: {"Total": n, "<Status>": n}}
+    database = database if database is not None else db
+    pipeline = []
+    if project_ids is not None:
+        pipeline.append({"$match": {"ProjectID": {"$in": list(project_ids)}}})
+    pipeline.append({"$group": {"_id": {"ProjectID": "$ProjectID", "Status": "$Status"}, "count": {"$sum": 1}}})
+
+    counts = {project_id: {"Total": 0} for project_id in project_ids or []}
+    for row in database.tasks.aggregate(pipeline):
+        project_counts = counts.setdefault(row['_id']['ProjectID'], {"Total": 0})
+        project_counts["Total"] += row['count']
+        field = task_counter_field(row['_id'].get('Status'))
+        if field:
+            status = field.split('.', 1)[1]
+            project_counts[status] = project_counts.get(status, 0) + row['count']
+    return counts
+
+
+def live_task(task_id):
+    # Task thuộc project chưa bị xóa mềm; None nếu task không tồn tại hoặc đang chờ purge-deleted xóa
+    task = db.tasks.find_one({"_id": task_id}, {"ProjectID": 1})
+    if task and projects_collection.find_one({"_id": task['ProjectID'], **NOT_DELETED}, {"_id": 1}):
+        return task
+    return None
+
+
+def inc_task_counts(project_id, counters):
+    # counters luôn có "Revision"; trả về {"_id", "Revision"} sau khi ghi, None nếu project không còn
+    project = projects_collection.find_one_and_update(
+        {"_id": project_id, **NOT_DELETED, "TaskCounts": {"$exists": True}}, {"$inc": counters},
+        projection={"Revision": 1}, return_document=ReturnDocument.AFTER
+    )
+    if project is None:
+        project = projects_collection.find_one_and_update(
+            {"_id": project_id, **NOT_DELETED}, {"$inc": {"Revision": 1}},
+            projection={"Revision": 1}, return_document=ReturnDocument.AFTER
+        )
+    return project
+
+
+def task_count_updates(counters):
+    # Cho bulk_write: {ProjectID: counters}, mỗi project đúng một trong hai lệnh khớp
+    updates = []
+    for project_id, inc in counters.items():
+        updates.append(UpdateOne({"_id": project_id, **NOT_DELETED, "TaskCounts": {"$exists": True}}, {"$inc": inc}))
+        updates.append(UpdateOne({"_id": project_id, **NOT_DELETED, "TaskCounts": {"$exists": False}},
+                                 {"$inc": {"Revision": 1}}))
+    return updates
+
+
+def project_task_counts(projects, database=None):
+    # TaskCounts của từng project; project cũ chưa có counters thì đếm lại một lần cho tất cả
+    missing = [project['_id'] for project in projects if 'TaskCounts' not in project]
+    recounted = count_tasks(missing, database) if missing else {}
+    return {project['_id']: project['TaskCounts'] if 'TaskCounts' in project else recounted[project['_id']]
+            for project in projects}
+
+
+@bp.cli.command("reconcile-task-counts")
+@click.option("--project", "project_id", default=None, help="Only reconcile this ProjectID.")
+def reconcile_task_counts(project_id):
+    """Recompute TaskCounts on projects from the tasks collection."""
+    if project_id:
+        if not ObjectId.is_valid(project_id):
+            raise click.BadParameter("Invalid ProjectID.", param_hint="--project")
+        project_ids = [ObjectId(project_id)]
+    else:
+        project_ids = [project['_id'] for project in projects_collection.find(NOT_DELETED, {"_id": 1})]
+
+    counts = count_tasks(project_ids)
+    updates = [UpdateOne({"_id": pid}, {"$set": {"TaskCounts": counts[pid]}}) for pid in project_ids]
+    fixed = 0
+    for start in range(0, len(updates), 1000):
+        fixed += projects_collection.bulk_write(updates[start:start + 1000], ordered=False).modified_count
+    click.echo(f"Reconciled {len(project_ids)} projects, {fixed} had drifted.")
+
+
+# --------------------------- BACKGROUND JOBS --------------------------- #
+# Mỗi worker đều có thread chạy job nhưng chỉ worker giữ được lock trong collection `locks`
+# mới thực sự chạy, tối đa một lần mỗi <interval> giây. Lock có lease để worker chết giữa chừng
+# không giữ lock mãi; job chạy lâu gọi renew() để gia hạn.
+def lock_owner():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def acquire_lock(name, owner, lease, respect_schedule=False):
+    # Lấy lock nếu chưa ai giữ hoặc lease cũ đã hết hạn; respect_schedule: chỉ lấy khi đã tới NextRun
+    now = datetime.utcnow()
+    query = {"_id": name, "LockedUntil": {"$lte": now}}
+    if respect_schedule:
+        query["NextRun"] = {"$lte": now}
+    try:
+        db.locks.find_one_and_update(
+            query,
+            {"$set": {"Owner": owner, "LockedUntil": now + timedelta(seconds=lease)},
+             "$setOnInsert": {"NextRun": now}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:  # Lock đang bị giữ (hoặc chưa tới lượt) nên upsert đụng _id có sẵn
+        return False
+
+
+def release_lock(name, owner, next_run_in=0, result=None):
+    now = datetime.utcnow()
+    db.locks.update_one(
+        {"_id": name, "Owner": owner},
+        {"$set": {"LockedUntil": now, "NextRun": now + timedelta(seconds=next_run_in),
+                  "LastRun": now, "LastResult": result}}
+    )
+
+
+def renew_lock(name, owner, lease):
+    db.locks.update_one({"_id": name, "Owner": owner},
+                        {"$set": {"LockedUntil": datetime.utcnow() + timedelta(seconds=lease)}})
+
+
+class BackgroundJob:
+    def __init__(self, app, name, fn, interval_key, lease_key):
+        # fn(renew) chạy trong app context, trả về kết quả để lưu vào LastResult
+        self.app = app
+        self.name = name
+        self.fn = fn
+        self.interval_key = interval_key
+        self.lease_key = lease_key
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        # Gọi ở mỗi request; thread được tạo một lần cho mỗi process (sau khi fork)
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._loop, name=self.name, daemon=True).start()
+
+    def _loop(self):
+        while True:
+            with self.app.app_context():
+                try:
+                    self.run_once()
+                except Exception:
+                    self.app.logger.exception("%s failed", self.name)
+            time.sleep(self.app.config[self.interval_key])
+
+    def run_once(self):
+        config = self.app.config
+        owner, lease = lock_owner(), config[self.lease_key]
+        if not acquire_lock(self.name, owner, lease, respect_schedule=True):
+            return None
+        result = None
+        try:
+            result = self.fn(lambda: renew_lock(self.name, owner, lease))
+            self.app.logger.info("%s: %s", self.name, result)
+            return result
+        finally:
+            release_lock(self.name, owner, config[self.interval_key], result)
+
+
+def run_job_now(name, lease, fn):
+    # Cho các lệnh CLI: chạy ngay (bỏ qua lịch) nhưng vẫn không chạy trùng với worker khác
+    owner = lock_owner()
+    if not acquire_lock(name, owner, lease):
+        click.echo(f"{name} is already running in another worker.", err=True)
+        sys.exit(1)
+    result = None
+    try:
+        result = fn(lambda: renew_lock(name, owner, lease))
+    finally:
+        # Lần chạy tay không đẩy lịch chạy nền
+        release_lock(name, owner, 0, result)
+    return result
+
+
+@bp.before_app_request
+def start_background_jobs():
+    for job in current_app.extensions['background_jobs']:
+        if current_app.config[job.interval_key]:
+            job.start()
+
+
+# ----------------------------- OVERDUE JOB ----------------------------- #
+# Thay cho cron của API Node: định kỳ đánh dấu task quá hạn (Overdue = True) và chuyển dự án
+# Ongoing đã qua EndDate sang Delayed, mỗi OVERDUE_JOB_INTERVAL giây.
+# create_task/update_task tự tính Overdue khi ghi, job chỉ cần bắt các task vừa tới hạn.
+# API Node và các lần sửa trực tiếp đổi Status/DueDate mà không đụng Overdue, nên job cũng bỏ cờ
+# của các task đã Completed hoặc đã dời hạn.
+OVERDUE_LOCK = "mark-overdue"
+
+
+def today():
+    return datetime.utcnow().strftime(DATE_FORMAT)
+
+
+def task_is_overdue(status, due_date):
+    # 'YYYY-MM-DD' so sánh chuỗi tương đương so sánh ngày
+    due_date = format_date(due_date)
+    return status != 'Completed' and isinstance(due_date, str) and "" < due_date <= today()
+
+
+def overdue_task_filter(day):
+    return {"Overdue": {"$ne": True}, "Status": {"$ne": "Completed"}, **date_range("DueDate", lte=day)}
+
+
+def cleared_task_filter(day):
+    return {"Overdue": True, "$or": [{"Status": "Completed"}, date_range("DueDate", gt=day)]}
+
+
+def delayed_project_filter(day):
+    return {"Status": "Ongoing", **NOT_DELETED, **date_range("EndDate", lt=day)}
+
+
+def mark_overdue(dry_run=False):
+    day = today()
+    task_filter = overdue_task_filter(day)
+    cleared_filter = cleared_task_filter(day)
+    project_filter = delayed_project_filter(day)
+
+    if dry_run:
+        return {"overdue_tasks": db.tasks.count_documents(task_filter),
+                "cleared_tasks": db.tasks.count_documents(cleared_filter),
+                "delayed_projects": projects_collection.count_documents(project_filter),
+                "dry_run": True}
+
+    # Project có task đổi Overdue cũng phải tăng Revision để ETag của /tasks, /project thay đổi
+    touched = set(db.tasks.distinct("ProjectID", task_filter))
+    overdue = db.tasks.update_many(task_filter, {"$set": {"Overdue": True}}).modified_count
+    touched.update(db.tasks.distinct("ProjectID", cleared_filter))
+    cleared = db.tasks.update_many(cleared_filter, {"$set": {"Overdue": False}}).modified_count
+
+    delayed_ids = [project['_id'] for project in projects_collection.find(project_filter, {"_id": 1})]
+    delayed = 0
+    if delayed_ids:
+        delayed = projects_collection.update_many(
+            {"_id": {"$in": delayed_ids}, "Status": "Ongoing"},
+            {"$set": {"Status": "Delayed"}, "$inc": {"Revision": 1}}
+        ).modified_count
+
+    touched.difference_update(delayed_ids)
+    if touched:
+        projects_collection.update_many({"_id": {"$in": list(touched)}}, {"$inc": {"Revision": 1}})
+    return {"overdue_tasks": overdue, "cleared_tasks": cleared, "delayed_projects": delayed, "dry_run": False}
+
+
+@bp.cli.command("mark-overdue")
+@click.option("--dry-run", is_flag=True, help="Only count what would change.")
+def mark_overdue_command(dry_run):
+    """Flag overdue tasks and move Ongoing projects past EndDate to Delayed."""
+    result = run_job_now(OVERDUE_LOCK, current_app.config['OVERDUE_JOB_LEASE'], lambda renew: mark_overdue(dry_run))
+    prefix = "Would mark" if dry_run else "Marked"
+    click.echo(f"{prefix} {result['overdue_tasks']} tasks overdue, {result['cleared_tasks']} no longer overdue "
+               f"and {result['delayed_projects']} projects delayed.")
+
+
+# ---------------------------- PROJECT PURGE ---------------------------- #
+# /deleteproject chỉ đánh dấu Deleted; job này xóa tasks của project theo từng batch _id
+# (DELETION_BATCH_SIZE, giới hạn DELETION_RATE task/giây) rồi mới xóa project.
+# Trạng thái nằm ở chính project (Deleted) nên job chạy lại bao nhiêu lần cũng được;
+# tiến độ ghi vào collection `deletions` cho /deletion_status.
+PURGE_LOCK = "purge-deleted"
+
+
+def track_deletion(project_id, requested_at=None, requested_by=None):
+    db.deletions.update_one(
+        {"_id": project_id},
+        {"$setOnInsert": {"Status": "pending", "RequestedAt": requested_at or datetime.utcnow(),
+                          "RequestedBy": requested_by, "TasksDeleted": 0}},
+        upsert=True
+    )
+
+
+def purge_project(project_id, batch_size, rate, renew=None):
+    track_deletion(project_id)  # Nếu worker chết giữa lúc đánh dấu Deleted và tạo bản ghi deletions
+    while True:
+        started = time.perf_counter()
+        ids = [task['_id'] for task in db.tasks.find({"ProjectID": project_id}, {"_id": 1})
+               .sort("_id", ASCENDING).limit(batch_size)]
+        if not ids:
+            break
+        deleted = db.tasks.delete_many({"ProjectID": project_id, "_id": {"$gte": ids[0], "$lte": ids[-1]}}).deleted_count
+        db.deletions.update_one({"_id": project_id}, {"$set": {"Status": "running", "UpdatedAt": datetime.utcnow()},
+                                                      "$inc": {"TasksDeleted": deleted}})
+        if renew:
+            renew()
+        if rate:
+            time.sleep(max(0.0, len(ids) / rate - (time.perf_counter() - started)))
+
+    projects_collection.delete_one({"_id": project_id, "Deleted": True})
+    db.deletions.update_one({"_id": project_id}, {"$set": {"Status": "done", "CompletedAt": datetime.utcnow()}})
+
+
+def purge_deleted(renew=None):
+    config = current_app.config
+    purged = 0
+    for project in projects_collection.find({"Deleted": True}, {"_id": 1}):
+        purge_project(project['_id'], config['DELETION_BATCH_SIZE'], config['DELETION_RATE'], renew)
+        purged += 1
+    return {"purged_projects": purged}
+
+
+@bp.cli.command("purge-deleted")
+def purge_deleted_command():
+    """Delete the tasks of soft-deleted projects, then the projects themselves."""
+    result = run_job_now(PURGE_LOCK, current_app.config['DELETION_JOB_LEASE'], purge_deleted)
+    click.echo(f"Purged {result['purged_projects']} projects.")
+
+
+# ------------------------------ ARCHIVE ------------------------------ #
+# Project Completed/Canceled có EndDate cũ hơn ARCHIVE_AFTER_DAYS ngày được chuyển (cùng tasks) sang
+# project_archive/tasks_archive để collection và index "nóng" nhỏ lại. Các route đọc chỉ xem
+# dữ liệu lưu trữ khi có include_archived=1; restore-project / /restore_project chuyển ngược lại.
+#
+# Thứ tự chuyển: chép project (Archiving = True) -> xóa project nóng nếu Revision chưa đổi -> chuyển tasks
+# (chép từng batch rồi xóa đúng các _id vừa chép, nên task được tạo sát lúc xóa project cũng được chuyển)
+# -> bỏ Archiving. Project bị sửa giữa chừng thì bản chép được xóa và để lần sau.
+# Worker chết giữa chừng thì lần chạy sau tiếp tục từ các bản ghi còn Archiving.
+ARCHIVE_LOCK = "archive-projects"
+ARCHIVE_STATUSES = ["Completed", "Canceled"]
+
+
+def copy_tasks(source, target, project_id, batch_size):
+    # Chép theo batch _id; ReplaceOne upsert nên chép lại nhiều lần vẫn đúng
+    last_id = None
+    while True:
+        query = {"ProjectID": project_id}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        tasks = list(source.find(query).sort("_id", ASCENDING).limit(batch_size))
+        if not tasks:
+            return
+        target.bulk_write([ReplaceOne({"_id": task['_id']}, task, upsert=True) for task in tasks], ordered=False)
+        last_id = tasks[-1]['_id']
+
+
+def delete_tasks(collection, project_id, batch_size):
+    while True:
+        ids = [task['_id'] for task in collection.find({"ProjectID": project_id}, {"_id": 1})
+               .sort("_id", ASCENDING).limit(batch_size)]
+        if not ids:
+            return
+        collection.delete_many({"ProjectID": project_id, "_id": {"$gte": ids[0], "$lte": ids[-1]}})
+
+
+def move_tasks(source, target, project_id, batch_size):
+    # Chép rồi xóa đúng các _id vừa chép cho tới khi source hết task của project
+    while True:
+        tasks = list(source.find({"ProjectID": project_id}).sort("_id", ASCENDING).limit(batch_size))
+        if not tasks:
+            return
+        target.bulk_write([ReplaceOne({"_id": task['_id']}, task, upsert=True) for task in tasks], ordered=False)
+        source.delete_many({"_id": {"$in": [task['_id'] for task in tasks]}})
+
+
+def archive_project(project, batch_size):
+    project_id = project['_id']
+    if 'TaskCounts' not in project:
+        project['TaskCounts'] = count_tasks([project_id])[project_id]
+
+    db.project_archive.replace_one({"_id": project_id},
+                                   {**project, "ArchivedAt": datetime.utcnow(), "Archiving": True}, upsert=True)
+
+    removed = projects_collection.delete_one({"_id": project_id, "Revision": project.get('Revision')}).deleted_count
+    if not removed and projects_collection.find_one({"_id": project_id}, {"_id": 1}):
+        # Project vừa bị sửa: bỏ bản chép, lần chạy sau sẽ xét lại
+        db.project_archive.delete_one({"_id": project_id})
+        return False
+
+    # Project đã rời collection nóng nên create_task không thêm được task mới (trừ request đang chạy dở,
+    # vòng lặp của move_tasks sẽ bắt các task đó)
+    move_tasks(db.tasks, db.tasks_archive, project_id, batch_size)
+    db.project_archive.update_one({"_id": project_id}, {"$unset": {"Archiving": ""}})
+    return True
+
+
+def archive_filter():
+    days = current_app.config['ARCHIVE_AFTER_DAYS']
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    return {
+        "Status": {"$in": ARCHIVE_STATUSES},
+        **NOT_DELETED,
+        "RestoredAt": {"$not": {"$gte": cutoff}},  # Vừa restore thì chưa lưu trữ lại
+        **date_range("EndDate", lt=cutoff.strftime(DATE_FORMAT))
+    }
+
+
+def archive_projects(renew=None, dry_run=False):
+    batch_size = current_app.config['ARCHIVE_BATCH_SIZE']
+    if dry_run:
+        return {"archived": projects_collection.count_documents(archive_filter()), "skipped": 0, "dry_run": True}
+
+    archived = skipped = 0
+    # Hoàn tất các project còn dở từ lần chạy trước
+    for pending in db.project_archive.find({"Archiving": True}):
+        project = projects_collection.find_one({"_id": pending['_id']})
+        if project and not archive_project(project, batch_size):
+            skipped += 1
+        elif not project:
+            move_tasks(db.tasks, db.tasks_archive, pending['_id'], batch_size)
+            db.project_archive.update_one({"_id": pending['_id']}, {"$unset": {"Archiving": ""}})
+
+    query = archive_filter()
+    while True:
+        projects = list(projects_collection.find(query).sort("_id", ASCENDING).limit(batch_size))
+        if not projects:
+            break
+        # Project bị bỏ qua vẫn khớp điều kiện, nên đi tiếp theo _id thay vì truy vấn lại từ đầu
+        query["_id"] = {"$gt": projects[-1]['_id']}
+        for project in projects:
+            if archive_project(project, batch_size):
+                archived += 1
+            else:
+                skipped += 1
+        if renew:
+            renew()
+    return {"archived": archived, "skipped": skipped, "dry_run": False}
+
+
+def restore_project(project_id):
+    # None nếu project không nằm trong archive
+    batch_size = current_app.config['ARCHIVE_BATCH_SIZE']
+    project = db.project_archive.find_one({"_id": project_id})
+    if not project:
+        return None
+    for field in ("ArchivedAt", "Archiving"):
+        project.pop(field, None)
+    project['RestoredAt'] = datetime.utcnow()
+    project['Revision'] = project.get('Revision', 0) + 1  # ETag cũ không còn khớp
+
+    copy_tasks(db.tasks_archive, db.tasks, project_id, batch_size)
+    projects_collection.replace_one({"_id": project_id}, project, upsert=True)
+    delete_tasks(db.tasks_archive, project_id, batch_size)
+    db.project_archive.delete_one({"_id": project_id})
+    return project
+
+
+@bp.route("/restore_project", methods=['POST'])
+def restore_project_route():
+    data = request.get_json()
+    admin_id = data.get('AdminID')
+    project_id = data.get('ProjectID')
+
+    if not admin_id or not project_id:
+        return jsonify({"error": "AdminID and ProjectID are required!"}), 400
+
+    if not ObjectId.is_valid(admin_id) or not ObjectId.is_valid(project_id):
+        return jsonify({"error": "Invalid ID format!"}), 400
+
+    try:
+        # Cùng quyền với /deleteproject: Creator hoặc Owner
+        allowed = db.project_archive.find_one({
+            "_id": ObjectId(project_id),
+            "$or": [
+                {"CreatedBy": ObjectId(admin_id)},
+                {"Members": {"$elemMatch": {"MemberID": ObjectId(admin_id), "Role": "Owner"}}}
+            ]
+        }, {"_id": 1})
+        if not allowed:
+            if not db.project_archive.find_one({"_id": ObjectId(project_id)}, {"_id": 1}):
+                return jsonify({"error": "Archived project not found."}), 404
+            return jsonify({"error": "Only the Creator or Owner can restore the project."}), 403
+
+        if not restore_project(ObjectId(project_id)):
+            return jsonify({"error": "Archived project not found."}), 404
+        return jsonify({"message": "Project restored successfully!"}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.cli.command("archive-projects")
+@click.option("--dry-run", is_flag=True, help="Only count the projects that would be archived.")
+def archive_projects_command(dry_run):
+    """Move finished projects and their tasks into the archive collections."""
+    result = run_job_now(ARCHIVE_LOCK, current_app.config['ARCHIVE_JOB_LEASE'],
+                         lambda renew: archive_projects(renew, dry_run))
+    prefix = "Would archive" if dry_run else "Archived"
+    click.echo(f"{prefix} {result['archived']} projects, {result['skipped']} changed while archiving.")
+
+
+@bp.cli.command("restore-project")
+@click.argument("project_id")
+def restore_project_command(project_id):
+    """Move an archived project and its tasks back into the live collections."""
+    if not ObjectId.is_valid(project_id):
+        raise click.BadParameter("Invalid ProjectID.", param_hint="PROJECT_ID")
+    if not restore_project(ObjectId(project_id)):
+        click.echo("Archived project not found.", err=True)
+        sys.exit(1)
+    click.echo("Project restored.")
+
+
+# --------------------------- DATA MIGRATIONS --------------------------- #
+# Chuyển các giá trị cũ lưu dạng chuỗi (StartDate/EndDate/DueDate, AssignedTo) sang kiểu đúng theo từng
+# batch thứ tự _id. Tiến độ lưu trong collection `migrations` nên có thể dừng và chạy tiếp; mỗi update chỉ
+# áp dụng nếu giá trị vẫn là chuỗi cũ để không ghi đè dữ liệu vừa được route ghi.
+def parse_object_id(value):
+    if not ObjectId.is_valid(value):
+        raise ValueError(f"Invalid ObjectId: {value!r}")
+    return ObjectId(value)
+
+
+def migrate_dates(collection_name, batch_size=500, rate=1000, restart=False, echo=None):
+    return migrate_fields(f"dates:{collection_name}", collection_name, DATE_FIELDS[collection_name], parse_date,
+                          batch_size, rate, restart, echo)
+
+
+def migrate_assignees(batch_size=500, rate=1000, restart=False, echo=None):
+    # /update_task từng ghi AssignedTo dạng chuỗi, các task đó không hiện trong /workload
+    return migrate_fields("assignees:tasks", "tasks", ["AssignedTo"], parse_object_id,
+                          batch_size, rate, restart, echo)
+
+
+def migrate_fields(checkpoint_id, collection_name, fields, convert, batch_size, rate, restart, echo):
+    collection = db[collection_name]
+    if restart:
+        db.migrations.delete_one({"_id": checkpoint_id})
+    checkpoint = db.migrations.find_one({"_id": checkpoint_id}) or {}
+    if checkpoint.get('Done'):
+        return checkpoint
+
+    last_id = checkpoint.get('LastID')
+    converted = checkpoint.get('Converted', 0)
+    invalid = checkpoint.get('Invalid', 0)
+    while True:
+        started = time.perf_counter()
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        batch = list(collection.find(query, {field: 1 for field in fields}).sort("_id", ASCENDING).limit(batch_size))
+        if not batch:
+            break
+
+        updates = []
+        for doc in batch:
+            for field in fields:
+                value = doc.get(field)
+                if not isinstance(value, str):
+                    continue
+                try:
+                    new_value = convert(value)
+                except ValueError:
+                    invalid += 1  # Giữ nguyên, cần sửa tay
+                    continue
+                updates.append(UpdateOne({"_id": doc['_id'], field: value}, {"$set": {field: new_value}}))
+        if updates:
+            converted += collection.bulk_write(updates, ordered=False).modified_count
+
+        last_id = batch[-1]['_id']
+        db.migrations.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {"LastID": last_id, "Converted": converted, "Invalid": invalid,
+                      "Done": False, "UpdatedAt": datetime.utcnow()}},
+            upsert=True
+        )
+        if echo:
+            echo(f"{collection_name}: up to {last_id}, {converted} converted, {invalid} invalid")
+
+        # Giới hạn tốc độ: `rate` document mỗi giây
+        if rate:
+            time.sleep(max(0.0, len(batch) / rate - (time.perf_counter() - started)))
+
+    checkpoint = {"_id": checkpoint_id, "LastID": last_id, "Converted": converted, "Invalid": invalid,
+                  "Done": True, "UpdatedAt": datetime.utcnow()}
+    db.migrations.replace_one({"_id": checkpoint_id}, checkpoint, upsert=True)
+    return checkpoint
+
+
+@bp.cli.command("migrate-dates")
+@click.option("--collection", "collection_names", multiple=True, type=click.Choice(list(DATE_FIELDS)),
+              help="Only migrate this collection (repeatable).")
+@click.option("--batch-size", default=500, show_default=True)
+@click.option("--rate", default=1000, show_default=True, help="Documents per second, 0 = unthrottled.")
+@click.option("--restart", is_flag=True, help="Ignore the saved checkpoint and start from the beginning.")
+def migrate_dates_command(collection_names, batch_size, rate, restart):
+    """Convert string StartDate/EndDate/DueDate values to datetimes, resumably."""
+    for collection_name in collection_names or DATE_FIELDS:
+        result = migrate_dates(collection_name, batch_size, rate, restart, echo=click.echo)
+        click.echo(f"{collection_name}: done, {result['Converted']} converted, {result['Invalid']} invalid.")
+
+
+@bp.cli.command("migrate-assignees")
+@click.option("--batch-size", default=500, show_default=True)
+@click.option("--rate", default=1000, show_default=True, help="Documents per second, 0 = unthrottled.")
+@click.option("--restart", is_flag=True, help="Ignore the saved checkpoint and start from the beginning.")
+def migrate_assignees_command(batch_size, rate, restart):
+    """Convert string AssignedTo values on tasks to ObjectIds, resumably."""
+    result = migrate_assignees(batch_size, rate, restart, echo=click.echo)
+    click.echo(f"tasks: done, {result['Converted']} converted, {result['Invalid']} invalid.")
+
+
+# --------------------------- PROGRESS BUFFER --------------------------- #
+# Khi PROGRESS_BUFFER_MS > 0, /update_task_progress chỉ ghi vào bộ nhớ của worker (giữ giá trị
+# mới nhất cho mỗi TaskID) và trả 202. Thread nền ghi cả buffer bằng một bulk_write unordered
+# mỗi PROGRESS_BUFFER_MS hoặc khi đủ PROGRESS_BUFFER_MAX TaskID.
+#
+# Cam kết về độ bền:
+# - 202 nghĩa là đã nhận vào bộ nhớ, CHƯA ghi vào MongoDB; đọc lại có thể thấy giá trị cũ tối đa
+#   khoảng PROGRESS_BUFFER_MS.
+# - Tắt bình thường (atexit, SIGTERM của gunicorn) sẽ flush phần còn lại.
+# - Worker bị kill -9 / crash thì mất các update chưa flush (tối đa một chu kỳ).
+# - Flush lỗi thì đưa lại vào buffer (giá trị mới hơn nhận trong lúc flush được ưu tiên) và thử lại
+#   ở chu kỳ sau; ghi $set nên ghi lại nhiều lần vẫn đúng.
+# - TaskID không tồn tại hoặc thuộc project đã xóa mềm thì bị bỏ khi flush, không báo lỗi cho client.
+def write_progress(entries):
+    tasks = list(db.tasks.find({"_id": {"$in": list(entries)}}, {"ProjectID": 1}))
+    project_ids = [project['_id'] for project in projects_collection.find(
+        {"_id": {"$in": list({task['ProjectID'] for task in tasks})}, **NOT_DELETED}, {"_id": 1})]
+    live = set(project_ids)
+    updates = [UpdateOne({"_id": task['_id']}, {"$set": {"Progress": entries[task['_id']]}})
+               for task in tasks if task['ProjectID'] in live]
+    if updates:
+        db.tasks.bulk_write(updates, ordered=False)
+        projects_collection.update_many({"_id": {"$in": project_ids}, **NOT_DELETED}, {"$inc": {"Revision": 1}})
+        publish_changes(project_ids, "tasks")
+
+
+class ProgressBuffer:
+    def __init__(self, app, interval_ms, max_entries):
+        self.app = app
+        self.interval = interval_ms / 1000
+        self.max_entries = max_entries
+        self.flushed = 0
+        self.failures = 0
+        self._pending = {}  # TaskID -> Progress mới nhất
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._pid = None
+
+    def put(self, task_id, progress):
+        self._start()
+        with self._cond:
+            self._pending[task_id] = progress
+            if len(self._pending) >= self.max_entries:
+                self._cond.notify()
+
+    def depth(self):
+        with self._cond:
+            return len(self._pending)
+
+    def _start(self):
+        # Thread flush được tạo một lần cho mỗi process (sau khi fork)
+        if self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._loop, name="progress-buffer", daemon=True).start()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._pending) >= self.max_entries, timeout=self.interval)
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._cond:
+                entries, self._pending = self._pending, {}
+            if not entries:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                with self.app.app_context():
+                    write_progress(entries)
+            except Exception:
+                with self._cond:
+                    for task_id, progress in entries.items():
+                        self._pending.setdefault(task_id, progress)
+                self.failures += 1
+                self.app.logger.exception("Progress buffer flush failed, %d updates re-queued", len(entries))
+                return 0
+            finally:
+                progress_flush_seconds.observe("/update_task_progress", time.perf_counter() - started)
+            self.flushed += len(entries)
+            return len(entries)
+
+
+# --------------------------- PROJECT EVENTS --------------------------- #
+# GET /project_events đẩy thay đổi của một project bằng Server-Sent Events thay cho việc client poll
+# /tasks và /project. Sự kiện chỉ là gợi ý ("tasks", "members", "deleted", "resync"), client đọc lại
+# bằng If-None-Match nên thường chỉ tốn một 304.
+#
+# - id của sự kiện là Revision của project. Kết nối lại với Last-Event-ID sẽ gửi lại các sự kiện còn trong
+#   ring buffer (PROJECT_EVENTS_BACKLOG mỗi project); thiếu sự kiện nào thì gửi một "resync" duy nhất.
+# - PROJECT_EVENTS_SOURCE = "memory": các route ghi publish trực tiếp nên chỉ subscriber cùng worker nhận
+#   ngay; mỗi heartbeat đọc Revision (một lần cho mỗi project, không phải mỗi subscriber) để bắt thay đổi
+#   từ worker khác hoặc job nền và gửi "resync".
+#   "changestream": mỗi worker một thread watch collection project (cần replica set), route không publish.
+# - Mỗi subscriber có hàng đợi PROJECT_EVENTS_QUEUE sự kiện; client đọc chậm làm đầy hàng đợi thì bỏ phần
+#   đang chờ và gửi "resync" thay vì giữ bộ nhớ không giới hạn.
+# - Mỗi kết nối giữ một thread của worker suốt PROJECT_EVENTS_TIMEOUT giây: chạy gunicorn với gthread/gevent.
+EVENT_SOURCES = ["memory", "changestream"]
+EVENT_HISTORY_PROJECTS = 1000  # Số project giữ ring buffer, project ít thay đổi nhất bị bỏ trước
+
+
+class Subscription:
+    def __init__(self, project_id, max_events):
+        self.project_id = project_id
+        self.max_events = max_events
+        self.lagged = False
+        self._events = []
+        self._cond = threading.Condition()
+
+    def put(self, event):
+        # False nếu hàng đợi đầy và các sự kiện đang chờ bị bỏ
+        with self._cond:
+            dropped = len(self._events) >= self.max_events
+            if dropped:
+                self._events = []
+                self.lagged = True
+            else:
+                self._events.append(event)
+            self._cond.notify()
+            return not dropped
+
+    def get(self, timeout):
+        # (các sự kiện đang chờ, có bị bỏ sự kiện không); rỗng nếu hết timeout
+        with self._cond:
+            self._cond.wait_for(lambda: self._events or self.lagged, timeout=timeout)
+            events, self._events = self._events, []
+            lagged, self.lagged = self.lagged, False
+            return events, lagged
+
+
+class ProjectEvents:
+    def __init__(self, app, source, backlog, max_events):
+        self.app = app
+        self.source = source
+        self.backlog = backlog
+        self.max_events = max_events
+        self.published = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._history = OrderedDict()  # ProjectID -> deque các sự kiện gần nhất
+        self._subscribers = {}  # ProjectID -> set(Subscription)
+        self._revisions = {}  # ProjectID -> (Revision, thời điểm đọc), dùng chung cho các subscriber
+        self._pid = None
+
+    def publish(self, project_id, event_type, revision, **data):
+        event = {"type": event_type, "ProjectID": project_id, "Revision": revision, **data}
+        with self._lock:
+            history = self._history.pop(project_id, None) or deque(maxlen=self.backlog)
+            history.append(event)
+            self._history[project_id] = history
+            if len(self._history) > EVENT_HISTORY_PROJECTS:
+                self._history.popitem(last=False)
+            subscribers = list(self._subscribers.get(project_id, ()))
+            self.published += 1
+        for subscription in subscribers:
+            if not subscription.put(event):
+                self.dropped += 1
+
+    def watched(self, project_ids):
+        with self._lock:
+            return [project_id for project_id in project_ids if project_id in self._subscribers]
+
+    def subscribe(self, project_id):
+        self._start()
+        subscription = Subscription(project_id, self.max_events)
+        with self._lock:
+            self._subscribers.setdefault(project_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.project_id, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.project_id, None)
+                self._revisions.pop(subscription.project_id, None)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def replay(self, project_id, since, revision):
+        # Các sự kiện sau Revision `since`; None nếu ring buffer không còn đủ từ since + 1 đến revision
+        with self._lock:
+            missed = [event for event in self._history.get(project_id, ()) if event['Revision'] > since]
+        if revision - since > len(missed):
+            return None
+        revisions = {event['Revision'] for event in missed}
+        if any(number not in revisions for number in range(since + 1, revision + 1)):
+            return None
+        return sorted(missed, key=lambda event: event['Revision'])
+
+    def current_revision(self, project_id, max_age):
+        # Revision trong MongoDB, None nếu project đã bị xóa; đọc tối đa một lần mỗi max_age giây cho mỗi project
+        now = time.monotonic()
+        with self._lock:
+            cached = self._revisions.get(project_id)
+        if cached and now - cached[1] < max_age:
+            return cached[0]
+        project = projects_collection.find_one({"_id": project_id, **NOT_DELETED}, {"Revision": 1})
+        revision = project.get('Revision', 0) if project else None
+        with self._lock:
+            if project_id in self._subscribers:
+                self._revisions[project_id] = (revision, now)
+        return revision
+
+    def _start(self):
+        # Thread change stream được tạo một lần cho mỗi process, khi có subscriber đầu tiên
+        if self.source != "changestream" or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._watch, name="project-events", daemon=True).start()
+
+    def _watch(self):
+        resume_token = None
+        pipeline = [{"$match": {"operationType": {"$in": ["update", "replace"]}}}]
+        while True:
+            try:
+                with self.app.app_context():
+                    with projects_collection.watch(pipeline, resume_after=resume_token) as stream:
+                        for change in stream:
+                            resume_token = stream.resume_token
+                            self._publish_change(change)
+            except Exception:
+                self.app.logger.exception("Project change stream failed, reconnecting")
+                time.sleep(1)
+
+    def _publish_change(self, change):
+        project_id = change['documentKey']['_id']
+        if change['operationType'] == 'replace':
+            # restore-project ghi lại cả document
+            self.publish(project_id, "resync", change['fullDocument'].get('Revision', 0))
+            return
+        fields = change['updateDescription']['updatedFields']
+        if 'Revision' not in fields:
+            return  # Ghi không đổi Revision (vd: Archiving) thì client không cần biết
+        if fields.get('Deleted'):
+            event_type = "deleted"
+        elif any(field.startswith("Members") for field in fields):
+            event_type = "members"
         else:
-            admin_in_project = next((member for member in project.get('Members', [])
-                                     if member['MemberID'] == ObjectId(admin_id) and member['Role'] == 'Owner'), None)
-            user_role = "Owner" if admin_in_project else None
+            event_type = "tasks"
+        self.publish(project_id, event_type, fields['Revision'])
 
-        if user_role not in ["Creator", "Owner"]:
-            return jsonify({"error": "Only the Creator or Owner can delete the project."}), 403
 
-        # Delete the project
-        result = projects_collection.delete_one({"_id": ObjectId(project_id)})
-        if result.deleted_count == 0:
-            return jsonify({"error": "Failed to delete project."}), 500
+def publish_event(project_id, event_type, revision, **data):
+    # Gọi sau khi ghi, với Revision mới của project
+    events = current_app.extensions['project_events']
+    if events.source == "memory":
+        events.publish(project_id, event_type, revision, **data)
+
+
+def publish_changes(project_ids, event_type):
+    # Cho các lệnh ghi nhiều project (bulk, progress buffer): chỉ đọc Revision của project đang có subscriber
+    events = current_app.extensions['project_events']
+    if events.source != "memory":
+        return
+    watched = events.watched(project_ids)
+    if watched:
+        for project in projects_collection.find({"_id": {"$in": watched}}, {"Revision": 1}):
+            events.publish(project['_id'], event_type, project.get('Revision', 0))
+
+
+def sse_event(event):
+    data = json.dumps({key: value for key, value in event.items() if key != 'type'}, cls=JSONEncoder)
+    return f"id: {event['Revision']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+
+@bp.route("/project_events", methods=['GET'])
+def project_events():
+    project_id = request.args.get('ProjectID')
+    user_id = request.args.get('UserID')
+
+    if not project_id or not user_id:
+        return jsonify({"error": "ProjectID and UserID are required!"}), 400
+
+    if not ObjectId.is_valid(project_id) or not ObjectId.is_valid(user_id):
+        return jsonify({"error": "Invalid ID format!"}), 400
 
-        # Optionally, delete associated tasks
-        db.tasks.delete_many({"ProjectID": ObjectId(project_id)})
+    # EventSource tự gửi Last-Event-ID khi kết nối lại; LastEventID cho lần mở trang mới
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('LastEventID')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({"error": "Last-Event-ID must be a Revision number!"}), 400
 
-        return jsonify({"message": "Project deleted successfully!"}), 200
+    events = current_app.extensions['project_events']
+    project_id = ObjectId(project_id)
+    try:
+        project = projects_collection.find_one({"_id": project_id, **NOT_DELETED},
+                                               {"CreatedBy": 1, "Members.MemberID": 1, "Revision": 1})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    if not project:
+        return jsonify({"error": "Project not found."}), 404
+
+    # Cùng quyền với /project
+    is_member = any(member['MemberID'] == ObjectId(user_id) for member in project.get('Members', []))
+    if not is_member and str(project.get('CreatedBy')) != user_id:
+        return jsonify({"error": "Access denied. You are not a member of this project."}), 403
+
+    # Đăng ký trước khi lấy ring buffer: sự kiện xảy ra ở giữa có thể nhận hai lần nhưng không bị mất
+    revision = project.get('Revision', 0)
+    since = revision if last_event_id is None else last_event_id
+    subscription = events.subscribe(project_id)
+    backlog = events.replay(project_id, since, revision)
+    config = current_app.config
+    heartbeat = config['PROJECT_EVENTS_HEARTBEAT']
+    timeout = config['PROJECT_EVENTS_TIMEOUT']
+
+    def stream():
+        sent = since
+        deadline = time.monotonic() + timeout if timeout else None
+        try:
+            if backlog is None:
+                yield sse_event({"type": "resync", "ProjectID": project_id, "Revision": revision})
+                sent = revision
+            else:
+                for event in backlog:
+                    yield sse_event(event)
+                    sent = event['Revision']
+            yield ": connected\n\n"  # Đẩy header ra ngay để client biết đã kết nối
+
+            while deadline is None or time.monotonic() < deadline:
+                pending, lagged = subscription.get(heartbeat)
+                if lagged or (not pending and events.source == "memory"):
+                    # Bị bỏ sự kiện, hoặc không có sự kiện trong worker này: so Revision với MongoDB
+                    current = events.current_revision(project_id, 0 if lagged else heartbeat)
+                    if current is None:
+                        pending = [{"type": "deleted", "ProjectID": project_id, "Revision": sent + 1}]
+                    elif lagged or current > sent:
+                        pending = [{"type": "resync", "ProjectID": project_id, "Revision": current}]
+
+                if not pending:
+                    yield ": heartbeat\n\n"
+                    continue
+                for event in pending:
+                    if event['Revision'] <= sent:
+                        continue  # Đã gửi từ ring buffer hoặc đã nằm trong resync
+                    yield sse_event(event)
+                    sent = event['Revision']
+                    if event['type'] == "deleted":
+                        return
+        finally:
+            events.unsubscribe(subscription)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    response = Response(stream_with_context(stream()), mimetype="text/event-stream", headers=headers)
+    # HEAD hoặc client ngắt trước chunk đầu thì generator không chạy, finally ở trên không được gọi
+    response.call_on_close(lambda: events.unsubscribe(subscription))
+    return response
+
 
 # -----------------------------TASK----------------------------------------
 
-@app.route("/create_task", methods=['POST'])
+@bp.route("/create_task", methods=['POST'])
 def create_task():
     data = request.get_json()
     admin_id = data.get('AdminID')  # Người tạo công việc
@@ -470,8 +2505,13 @@ def create_task():
     if not ObjectId.is_valid(admin_id) or not ObjectId.is_valid(project_id) or not ObjectId.is_valid(assigned_to):
         return jsonify({"error": "Invalid ID format!"}), 400
 
+    try:
+        due_date = parse_date(due_date)
+    except ValueError:
+        return jsonify({"error": "Invalid date format! Use YYYY-MM-DD."}), 400
+
     # Check if project exists
-    project = projects_collection.find_one({"_id": ObjectId(project_id)})
+    project = projects_collection.find_one({"_id": ObjectId(project_id), **NOT_DELETED})
     if not project:
         return jsonify({"error": "Project not found."}), 404
 
@@ -489,16 +2529,24 @@ def create_task():
         'Description': description,
         'DueDate': due_date,
         'Status': status,
+        'Overdue': task_is_overdue(status, due_date),
         'CreateDate': datetime.utcnow()
     }
     try:
         db.tasks.insert_one(task)
+        counters = {"TaskCounts.Total": 1, "Revision": 1}
+        status_field = task_counter_field(status)
+        if status_field:
+            counters[status_field] = 1
+        project = inc_task_counts(ObjectId(project_id), counters)
+        if project:
+            publish_event(project['_id'], "tasks", project['Revision'], TaskIDs=[task['_id']])
         return jsonify({"message": "Task created successfully!"}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/update_task", methods=['PUT'])
+@bp.route("/update_task", methods=['PUT'])
 def update_task():
     data = request.get_json()
     task_id = data.get('TaskID')
@@ -519,34 +2567,322 @@ def update_task():
     # Remove None values
     updates = {key: value for key, value in updates.items() if value is not None}
 
+    # Lưu ObjectId như create_task và /update_tasks, nếu không task sẽ mất khỏi /workload
+    if 'AssignedTo' in updates:
+        if not ObjectId.is_valid(updates['AssignedTo']):
+            return jsonify({"error": "Invalid ID format!"}), 400
+        updates['AssignedTo'] = ObjectId(updates['AssignedTo'])
+
+    if 'DueDate' in updates:
+        try:
+            updates['DueDate'] = parse_date(updates['DueDate'])
+        except ValueError:
+            return jsonify({"error": "Invalid date format! Use YYYY-MM-DD."}), 400
+
     try:
-        result = db.tasks.update_one({"_id": ObjectId(task_id)}, {"$set": updates})
-        if result.matched_count == 0:
+        if not live_task(ObjectId(task_id)):
             return jsonify({"error": "Task not found."}), 404
+
+        # Lấy Status cũ trong cùng thao tác ghi để cập nhật counters chính xác
+        previous = db.tasks.find_one_and_update(
+            {"_id": ObjectId(task_id)},
+            {"$set": updates},
+            projection={"ProjectID": 1, "Status": 1, "DueDate": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        if previous is None:
+            return jsonify({"error": "Task not found."}), 404
+
+        if 'Status' in updates or 'DueDate' in updates:
+            # Chỉ ghi Overdue nếu Status/DueDate vẫn là giá trị vừa dùng để tính (tránh ghi đè update khác)
+            status = updates.get('Status', previous.get('Status'))
+            due_date = updates.get('DueDate', previous.get('DueDate'))
+            db.tasks.update_one({"_id": ObjectId(task_id), "Status": status, "DueDate": due_date},
+                                {"$set": {"Overdue": task_is_overdue(status, due_date)}})
+
+        counters = {"Revision": 1}
+        if 'Status' in updates and updates['Status'] != previous.get('Status'):
+            old_field = task_counter_field(previous.get('Status'))
+            new_field = task_counter_field(updates['Status'])
+            if old_field:
+                counters[old_field] = -1
+            if new_field:
+                counters[new_field] = 1
+        project = inc_task_counts(previous['ProjectID'], counters)
+        if project:
+            publish_event(project['_id'], "tasks", project['Revision'], TaskIDs=[previous['_id']])
         return jsonify({"message": "Task updated successfully!"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# ---------------------------- BULK TASKS ---------------------------- #
+# Mỗi phần tử có kết quả riêng {"index", "TaskID"} hoặc {"index", "error"}; phần tử lỗi không
+# làm hỏng cả batch. Quyền kiểm tra một lần cho mỗi project, AssignedTo tra bằng một query $in.
+def bulk_items(data, key):
+    items = data.get(key)
+    if not data.get('AdminID') or not isinstance(items, list) or not items:
+        return None, f"AdminID and a non-empty {key} list are required!"
+    if len(items) > BULK_MAX_ITEMS:
+        return None, f"At most {BULK_MAX_ITEMS} items per request!"
+    if not ObjectId.is_valid(data['AdminID']):
+        return None, "Invalid AdminID format!"
+    return items, None
+
+
+def task_permissions(admin_id, project_ids):
+    # {ProjectID: admin có quyền Owner/Leader hay không}; project không tồn tại thì không có key
+    projects = projects_collection.find({"_id": {"$in": list(project_ids)}, **NOT_DELETED}, {"Members": 1})
+    return {project['_id']: any(member['MemberID'] == admin_id and member['Role'] in ['Owner', 'Leader']
+                                for member in project.get('Members', []))
+            for project in projects}
+
+
+def existing_user_ids(user_ids):
+    if not user_ids:
+        return set()
+    return {user['_id'] for user in user_collection.find({"_id": {"$in": list(user_ids)}}, {"_id": 1})}
+
+
+def bulk_response(results, success_status):
+    failed = sum(1 for result in results if 'error' in result)
+    status = success_status if not failed else 207
+    return jsonify({"results": results, "succeeded": len(results) - failed, "failed": failed}), status
+
+
+@bp.route("/create_tasks", methods=['POST'])
+def create_tasks():
+    data = request.get_json()
+    items, error = bulk_items(data, 'Tasks')
+    if error:
+        return jsonify({"error": error}), 400
+    admin_id = ObjectId(data['AdminID'])
+
+    results = [{"index": index} for index in range(len(items))]
+    tasks = {}  # index -> document
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get('ProjectID') or not item.get('TaskName') or not item.get('DueDate'):
+            results[index]['error'] = "Missing required fields!"
+        elif not ObjectId.is_valid(item['ProjectID']) or not ObjectId.is_valid(item.get('AssignedTo')):
+            results[index]['error'] = "Invalid ID format!"
+        else:
+            try:
+                due_date = parse_date(item['DueDate'])
+            except ValueError:
+                results[index]['error'] = "Invalid date format! Use YYYY-MM-DD."
+                continue
+            status = item.get('Status', 'Pending')
+            tasks[index] = {
+                'ProjectID': ObjectId(item['ProjectID']),
+                'AssignedTo': ObjectId(item['AssignedTo']),
+                'TaskName': item['TaskName'],
+                'Description': item.get('Description'),
+                'DueDate': due_date,
+                'Status': status,
+                'Overdue': task_is_overdue(status, due_date),
+                'CreateDate': datetime.utcnow()
+            }
+
+    try:
+        allowed = task_permissions(admin_id, {task['ProjectID'] for task in tasks.values()})
+        assignees = existing_user_ids({task['AssignedTo'] for task in tasks.values()})
+        for index, task in list(tasks.items()):
+            if task['ProjectID'] not in allowed:
+                results[index]['error'] = "Project not found."
+            elif not allowed[task['ProjectID']]:
+                results[index]['error'] = "You do not have permission to create tasks in this project."
+            elif task['AssignedTo'] not in assignees:
+                results[index]['error'] = "Assigned user not found."
+            else:
+                continue
+            del tasks[index]
+
+        order = list(tasks)
+        write_errors = {}
+        if order:
+            try:
+                db.tasks.insert_many([tasks[index] for index in order], ordered=False)
+            except BulkWriteError as e:
+                write_errors = {order[error['index']]: error['errmsg'] for error in e.details['writeErrors']}
+
+        counters = {}
+        for index in order:
+            if index in write_errors:
+                results[index]['error'] = write_errors[index]
+                continue
+            task = tasks[index]
+            results[index]['TaskID'] = task['_id']
+            inc = counters.setdefault(task['ProjectID'], {"TaskCounts.Total": 0, "Revision": 1})
+            inc["TaskCounts.Total"] += 1
+            status_field = task_counter_field(task['Status'])
+            if status_field:
+                inc[status_field] = inc.get(status_field, 0) + 1
+        if counters:
+            projects_collection.bulk_write(task_count_updates(counters), ordered=False)
+            publish_changes(list(counters), "tasks")
+        return bulk_response(results, 201)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.route("/update_tasks", methods=['PUT'])
+def update_tasks():
+    data = request.get_json()
+    items, error = bulk_items(data, 'Tasks')
+    if error:
+        return jsonify({"error": error}), 400
+    admin_id = ObjectId(data['AdminID'])
+
+    results = [{"index": index} for index in range(len(items))]
+    updates = {}  # index -> (TaskID, fields cần $set)
+    seen = set()
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get('TaskID'):
+            results[index]['error'] = "TaskID is required!"
+            continue
+        if not ObjectId.is_valid(item['TaskID']):
+            results[index]['error'] = "Invalid TaskID format!"
+            continue
+        task_id = ObjectId(item['TaskID'])
+        if task_id in seen:
+            results[index]['error'] = "Duplicate TaskID in request."
+            continue
+        seen.add(task_id)
+
+        fields = {key: item[key] for key in ("TaskName", "Description", "DueDate", "Status", "AssignedTo")
+                  if item.get(key) is not None}
+        if 'AssignedTo' in fields:
+            if not ObjectId.is_valid(fields['AssignedTo']):
+                results[index]['error'] = "Invalid ID format!"
+                continue
+            fields['AssignedTo'] = ObjectId(fields['AssignedTo'])
+        if 'DueDate' in fields:
+            try:
+                fields['DueDate'] = parse_date(fields['DueDate'])
+            except ValueError:
+                results[index]['error'] = "Invalid date format! Use YYYY-MM-DD."
+                continue
+        updates[index] = (task_id, fields)
+
+    try:
+        previous = {task['_id']: task for task in db.tasks.find(
+            {"_id": {"$in": [task_id for task_id, _ in updates.values()]}},
+            {"ProjectID": 1, "Status": 1, "DueDate": 1}
+        )}
+        allowed = task_permissions(admin_id, {task['ProjectID'] for task in previous.values()})
+        assignees = existing_user_ids({fields['AssignedTo'] for _, fields in updates.values() if 'AssignedTo' in fields})
+
+        operations = {}  # index -> UpdateOne
+        for index, (task_id, fields) in updates.items():
+            task = previous.get(task_id)
+            if task is None:
+                results[index]['error'] = "Task not found."
+            elif not allowed.get(task['ProjectID']):
+                results[index]['error'] = "You do not have permission to update tasks in this project."
+            elif 'AssignedTo' in fields and fields['AssignedTo'] not in assignees:
+                results[index]['error'] = "Assigned user not found."
+            else:
+                status = fields.get('Status', task.get('Status'))
+                due_date = fields.get('DueDate', task.get('DueDate'))
+                fields['Overdue'] = task_is_overdue(status, due_date)
+                # Chỉ ghi nếu Status/DueDate chưa bị đổi kể từ lúc đọc, để counters và Overdue luôn đúng
+                operations[index] = UpdateOne({"_id": task_id, "Status": task.get('Status'), "DueDate": task.get('DueDate')},
+                                              {"$set": fields})
+
+        order = list(operations)
+        applied = set(order)
+        write_errors = {}
+        if order:
+            try:
+                result = db.tasks.bulk_write([operations[index] for index in order], ordered=False)
+                matched = result.matched_count
+            except BulkWriteError as e:
+                write_errors = {order[error['index']]: error['errmsg'] for error in e.details['writeErrors']}
+                matched = e.details['nMatched']
+            applied -= set(write_errors)
+            if matched < len(applied):
+                # Một số task bị sửa đồng thời: đọc lại để biết update nào đã được áp dụng
+                current = {task['_id']: task for task in db.tasks.find(
+                    {"_id": {"$in": [updates[index][0] for index in applied]}})}
+                for index in list(applied):
+                    task_id, fields = updates[index]
+                    task = current.get(task_id, {})
+                    if any(task.get(key) != value for key, value in fields.items()):
+                        applied.discard(index)
+                        results[index]['error'] = "Task was modified concurrently, please retry."
+
+        counters = {}
+        for index in order:
+            if index in write_errors:
+                results[index]['error'] = write_errors[index]
+            if index not in applied:
+                continue
+            task_id, fields = updates[index]
+            task = previous[task_id]
+            results[index]['TaskID'] = task_id
+            inc = counters.setdefault(task['ProjectID'], {"Revision": 1})
+            if 'Status' in fields and fields['Status'] != task.get('Status'):
+                old_field = task_counter_field(task.get('Status'))
+                new_field = task_counter_field(fields['Status'])
+                if old_field:
+                    inc[old_field] = inc.get(old_field, 0) - 1
+                if new_field:
+                    inc[new_field] = inc.get(new_field, 0) + 1
+        if counters:
+            projects_collection.bulk_write(task_count_updates(counters), ordered=False)
+            publish_changes(list(counters), "tasks")
+        return bulk_response(results, 200)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # --------------------------- TASK ROUTES --------------------------- #
-@app.route("/tasks", methods=['GET'])
+@bp.route("/tasks", methods=['GET'])
 def list_tasks():
     project_id = request.args.get('ProjectID')
 
     if not project_id or not ObjectId.is_valid(project_id):
         return jsonify({"error": "Valid ProjectID is required!"}), 400
 
-    try:
-        tasks = list(db.tasks.find({"ProjectID": ObjectId(project_id)}))
-        for task in tasks:
-            task['_id'] = str(task['_id'])
-            task['ProjectID'] = str(task['ProjectID'])
-            task['AssignedTo'] = str(task['AssignedTo'])
+    limit, after, fields, error = page_args()
+    if error:
+        return jsonify({"error": error}), 400
 
-        return jsonify({"tasks": tasks}), 200
+    try:
+        # Đọc Revision trước khi đọc tasks để ETag không bao giờ mới hơn dữ liệu trả về
+        tasks_collection = db.tasks
+        etag = project_etag(ObjectId(project_id), request.query_string)
+        if etag is None and wants_archived():
+            archived = db.project_archive.find_one({"_id": ObjectId(project_id)}, {"Revision": 1})
+            if archived:
+                tasks_collection = db.tasks_archive
+                etag = etag_for(archived['_id'], archived.get('Revision', 0), request.query_string)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        if etag is None:
+            # Project không tồn tại hoặc đã bị xóa (tasks đang chờ job xóa)
+            return jsonify({"tasks": [], **({"next": None} if limit else {})}), 200
+
+        query = {"ProjectID": ObjectId(project_id)}
+        if after:
+            query["_id"] = {"$gt": after}
+        projection = {field: 1 for field in fields} if fields else None
+
+        cursor = tasks_collection.find(query, projection).sort("_id", ASCENDING)
+        if limit:
+            cursor = cursor.limit(limit)
+
+        if wants_stream():
+            return ndjson_response(format_dates(task) for task in cursor.batch_size(STREAM_BATCH_SIZE))
+
+        tasks = [format_dates(task) for task in cursor]
+        response = {"tasks": tasks}
+        if limit:
+            response["next"] = tasks[-1]['_id'] if len(tasks) == limit else None
+        return with_etag(jsonify(response), etag), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route("/update_task_progress", methods=['PUT'])
+@bp.route("/update_task_progress", methods=['PUT'])
 def update_task_progress():
     data = request.get_json()
     task_id = data.get('TaskID')
@@ -558,15 +2894,32 @@ def update_task_progress():
     if not ObjectId.is_valid(task_id):
         return jsonify({"error": "Invalid TaskID format!"}), 400
 
+    buffer = current_app.extensions.get('progress_buffer')
+    if buffer is not None:
+        buffer.put(ObjectId(task_id), progress)
+        return jsonify({"message": "Progress update accepted."}), 202
+
     try:
-        result = db.tasks.update_one({"_id": ObjectId(task_id)}, {"$set": {"Progress": progress}})
-        if result.matched_count == 0:
+        if not live_task(ObjectId(task_id)):
             return jsonify({"error": "Task not found."}), 404
+        task = db.tasks.find_one_and_update(
+            {"_id": ObjectId(task_id)},
+            {"$set": {"Progress": progress}},
+            projection={"ProjectID": 1}
+        )
+        if task is None:
+            return jsonify({"error": "Task not found."}), 404
+        project = projects_collection.find_one_and_update({"_id": task['ProjectID'], **NOT_DELETED},
+                                                          {"$inc": {"Revision": 1}},
+                                                          projection={"Revision": 1},
+                                                          return_document=ReturnDocument.AFTER)
+        if project:
+            publish_event(project['_id'], "tasks", project['Revision'], TaskIDs=[task['_id']])
         return jsonify({"message": "Progress updated successfully!"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route("/project_report", methods=['GET'])
+@bp.route("/project_report", methods=['GET'])
 def project_report():
     project_id = request.args.get('ProjectID')
 
@@ -574,9 +2927,16 @@ def project_report():
         return jsonify({"error": "Valid ProjectID is required!"}), 400
 
     try:
-        tasks = list(db.tasks.find({"ProjectID": ObjectId(project_id)}))
-        total_tasks = len(tasks)
-        completed_tasks = sum(1 for task in tasks if task['Status'] == 'Completed')
+        # Route báo cáo đọc qua report_db (có thể là secondary, chấp nhận trễ replication)
+        project = report_db.project.find_one({"_id": ObjectId(project_id), **NOT_DELETED}, {"TaskCounts": 1})
+        if not project and wants_archived():
+            project = report_db.project_archive.find_one({"_id": ObjectId(project_id)}, {"TaskCounts": 1})
+        if project:
+            task_counts = project_task_counts([project], report_db)[project['_id']]
+        else:
+            task_counts = {}
+        total_tasks = task_counts.get('Total', 0)
+        completed_tasks = task_counts.get('Completed', 0)
 
         report = {
             "TotalTasks": total_tasks,
@@ -592,7 +2952,7 @@ def project_report():
 
 
 
-@app.route("/task_progress_report", methods=['GET'])
+@bp.route("/task_progress_report", methods=['GET'])
 def progress_report():
     user_id = request.args.get('UserID')
 
@@ -604,30 +2964,46 @@ def progress_report():
 
     try:
         # Lấy danh sách các dự án mà người dùng tham gia hoặc quản lý
-        projects = list(projects_collection.find({
+        membership = {
             "$or": [
                 {"Members.MemberID": ObjectId(user_id)},
                 {"CreatedBy": ObjectId(user_id)}
-            ]
-        }))
+            ],
+            **NOT_DELETED
+        }
+        projects = list(report_db.project.find(membership, {"ProjectName": 1, "TaskCounts": 1}))
+        task_collections = [report_db.tasks]
+        if wants_archived():
+            # Project lưu trữ luôn có TaskCounts (được bổ sung khi lưu trữ)
+            projects += report_db.project_archive.find(membership, {"ProjectName": 1, "TaskCounts": 1})
+            task_collections.append(report_db.tasks_archive)
 
         if not projects:
             return jsonify({"error": "No projects found for this user."}), 404
 
+        # Total/Completed/Ongoing đọc từ TaskCounts của project
+        counts = project_task_counts(projects, report_db)
+
+        # Overdue do job mark-overdue và các route ghi task duy trì, chỉ cần đếm theo index
+        overdue = {
+            row['_id']: row['count'] for tasks_collection in task_collections for row in tasks_collection.aggregate([
+                {"$match": {
+                    "ProjectID": {"$in": [project['_id'] for project in projects]},
+                    "Overdue": True
+                }},
+                {"$group": {"_id": "$ProjectID", "count": {"$sum": 1}}}
+            ])
+        }
+
         # Duyệt qua từng dự án và tổng hợp dữ liệu
         report = []
         for project in projects:
-            project_id = project['_id']
             project_name = project['ProjectName']
-
-            # Lấy tất cả nhiệm vụ thuộc dự án
-            tasks = list(db.tasks.find({"ProjectID": project_id}))
-            total_tasks = len(tasks)
-            completed_tasks = sum(1 for task in tasks if task['Status'] == 'Completed')
-            ongoing_tasks = sum(1 for task in tasks if task['Status'] == 'Ongoing')
-            overdue_tasks = sum(
-                1 for task in tasks if task['DueDate'] and task['Status'] != 'Completed' and datetime.strptime(task['DueDate'], '%Y-%m-%d') < datetime.utcnow()
-            )
+            task_counts = counts[project['_id']]
+            total_tasks = task_counts.get('Total', 0)
+            completed_tasks = task_counts.get('Completed', 0)
+            ongoing_tasks = task_counts.get('Ongoing', 0)
+            overdue_tasks = overdue.get(project['_id'], 0)
 
             # Tính phần trăm hoàn thành
             progress = round((completed_tasks / total_tasks) * 100, 2) if total_tasks > 0 else 0
@@ -647,70 +3023,234 @@ def progress_report():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-# app.json_encoder = JSONEncoder 
-# @app.route("/search_projects", methods=['GET'])
-# def search_user_projects():
-#     # Query parameters
-#     user_id = request.args.get('UserID')  # User ID to filter projects
-#     query = request.args.get('query', '').strip()  # Search query
-#     status = request.args.get('status')  # Filter by status
-#     start_date = request.args.get('start_date')  # Filter by start date (YYYY-MM-DD)
-#     end_date = request.args.get('end_date')  # Filter by end date (YYYY-MM-DD)
-#     page = int(request.args.get('page', 1))  # Pagination: page number
-#     page_size = int(request.args.get('page_size', 10))  # Pagination: number of results per page
-
-#     if not user_id:
-#         return jsonify({"error": "UserID is required!"}), 400
-
-#     if page < 1 or page_size < 1:
-#         return jsonify({"error": "Page and page_size must be greater than 0!"}), 400
-
-#     if not ObjectId.is_valid(user_id):
-#         return jsonify({"error": "Invalid UserID format!"}), 400
-
-#     try:
-#         # Base filters to find projects associated with the user
-#         filters = {
-#             "$or": [
-#                 {"CreatedBy": ObjectId(user_id)},
-#                 {"Members.MemberID": ObjectId(user_id)}
-#             ]
-#         }
-
-#         # Additional filters based on query parameters
-#         if query:
-#             filters["$or"] = filters["$or"] + [
-#                 {"ProjectName": {"$regex": query, "$options": "i"}},
-#                 {"Description": {"$regex": query, "$options": "i"}}
-#             ]
-#         if status:
-#             filters["Status"] = status
-#         if start_date:
-#             filters["StartDate"] = {"$gte": start_date}
-#         if end_date:
-#             filters["EndDate"] = {"$lte": end_date}
-
-#         # Pagination logic
-#         skip = (page - 1) * page_size
-#         total_projects = projects_collection.count_documents(filters)  # Total matching projects
-
-#         # Fetch filtered and paginated projects
-#         projects = list(projects_collection.find(filters)
-#                         .skip(skip)
-#                         .limit(page_size)
-#                         .sort("CreateDate", -1))  # Sort by CreateDate descending
-
-#         response = {
-#             "total_projects": total_projects,
-#             "page": page,
-#             "page_size": page_size,
-#             "projects": projects
-#         }
-
-#         return jsonify(response), 200
-#     except Exception as e:
-#         return jsonify({"error": str(e)}), 500
+@bp.route("/search_projects", methods=['GET'])
+def search_user_projects():
+    # Query parameters
+    user_id = request.args.get('UserID')  # User ID to filter projects
+    query = request.args.get('query', '').strip()  # Search query (dùng text index)
+    status = request.args.get('status')  # Filter by status
+    start_date = request.args.get('start_date')  # Filter by start date (YYYY-MM-DD)
+    end_date = request.args.get('end_date')  # Filter by end date (YYYY-MM-DD)
+
+    if not user_id:
+        return jsonify({"error": "UserID is required!"}), 400
+
+    try:
+        page = int(request.args.get('page', 1))  # Pagination: page number
+        page_size = int(request.args.get('page_size', 10))  # Pagination: number of results per page
+    except ValueError:
+        return jsonify({"error": "Page and page_size must be integers!"}), 400
+
+    if page < 1 or not 1 <= page_size <= MAX_PAGE_SIZE:
+        return jsonify({"error": f"Page must be greater than 0 and page_size between 1 and {MAX_PAGE_SIZE}!"}), 400
+
+    if not ObjectId.is_valid(user_id):
+        return jsonify({"error": "Invalid UserID format!"}), 400
+
+    try:
+        for value in (start_date, end_date):
+            parse_date(value)
+    except ValueError:
+        return jsonify({"error": "Invalid date format! Use YYYY-MM-DD."}), 400
+
+    try:
+        # Chỉ tìm trong các dự án mà user tạo hoặc tham gia
+        filters = {
+            "$or": [
+                {"CreatedBy": ObjectId(user_id)},
+                {"Members.MemberID": ObjectId(user_id)}
+            ],
+            **NOT_DELETED
+        }
+        if query:
+            filters["$text"] = {"$search": query}
+        if status:
+            filters["Status"] = status
+        date_filters = []
+        if start_date:
+            date_filters.append(date_range("StartDate", gte=start_date))
+        if end_date:
+            date_filters.append(date_range("EndDate", lte=end_date))
+        if date_filters:
+            filters["$and"] = date_filters
+
+        # Kết quả liên quan nhất trước khi có query, còn lại mới nhất trước
+        sort = {"CreateDate": -1, "_id": -1}
+        if query:
+            sort = {"score": {"$meta": "textScore"}, **sort}
+
+        # Tổng số và một trang kết quả trong cùng một round trip
+        pipeline = [
+            {"$match": filters},
+            {"$facet": {
+                "total": [{"$count": "count"}],
+                "projects": [
+                    {"$sort": sort},
+                    {"$skip": (page - 1) * page_size},
+                    {"$limit": page_size},
+                    {"$project": {
+                        "_id": 0, "ProjectID": "$_id", "ProjectName": 1, "Description": 1, "Status": 1,
+                        "StartDate": 1, "EndDate": 1, "CreatedBy": 1, "CreateDate": 1
+                    }}
+                ]
+            }}
+        ]
+        result = next(projects_collection.aggregate(pipeline))
+
+        response = {
+            "total_projects": result['total'][0]['count'] if result['total'] else 0,
+            "page": page,
+            "page_size": page_size,
+            "projects": [format_dates(project) for project in result['projects']]
+        }
+        return jsonify(response), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def due_week(field):
+    # Thứ Hai (00:00 UTC) của tuần chứa ngày; dùng toán tử có từ MongoDB 3.6 thay vì $dateTrunc (5.0)
+    date = f"${field}"
+    if current_app.config['LEGACY_STRING_DATES']:
+        date = {"$cond": [
+            {"$eq": [{"$type": date}, "string"]},
+            {"$dateFromString": {"dateString": date, "format": "%Y-%m-%d", "onError": None}},
+            date
+        ]}
+    return {"$let": {"vars": {"date": date}, "in": {
+        # $dayOfWeek: Chủ nhật = 1, nên số ngày kể từ thứ Hai là ($dayOfWeek + 5) % 7
+        "$subtract": ["$$date", {"$multiply": [{"$mod": [{"$add": [{"$dayOfWeek": "$$date"}, 5]}, 7]}, 24 * 3600 * 1000]}]
+    }}}
+
+
+@bp.route("/workload", methods=['GET'])
+def user_workload():
+    # Tasks được giao cho một user trên mọi project, thay cho /user_projects + /tasks cho từng project
+    user_id = request.args.get('UserID')
+    start_date = request.args.get('start_date')  # Lọc DueDate từ ngày (YYYY-MM-DD)
+    end_date = request.args.get('end_date')  # Lọc DueDate đến ngày (YYYY-MM-DD)
+
+    if not user_id:
+        return jsonify({"error": "UserID is required!"}), 400
+
+    try:
+        page = int(request.args.get('page', 1))
+        page_size = int(request.args.get('page_size', 50))
+    except ValueError:
+        return jsonify({"error": "Page and page_size must be integers!"}), 400
+
+    if page < 1 or not 1 <= page_size <= MAX_PAGE_SIZE:
+        return jsonify({"error": f"Page must be greater than 0 and page_size between 1 and {MAX_PAGE_SIZE}!"}), 400
+
+    if not ObjectId.is_valid(user_id):
+        return jsonify({"error": "Invalid UserID format!"}), 400
+
+    try:
+        for value in (start_date, end_date):
+            parse_date(value)
+    except ValueError:
+        return jsonify({"error": "Invalid date format! Use YYYY-MM-DD."}), 400
+
+    try:
+        filters = {"AssignedTo": ObjectId(user_id)}
+        bounds = {key: value for key, value in (("gte", start_date), ("lte", end_date)) if value}
+        if bounds:
+            filters.update(date_range("DueDate", **bounds))
+
+        # Một aggregation trên index AssignedTo + DueDate + _id: $match và $sort lấy thẳng từ index,
+        # $facet tính số task theo Status, theo tuần đến hạn và một trang tasks.
+        # Tasks của project đã xóa mềm vẫn được đếm cho tới khi job purge-deleted xóa chúng,
+        # nhưng bị bỏ khỏi trang (trang có thể ít hơn page_size).
+        pipeline = [
+            {"$match": filters},
+            {"$sort": {"DueDate": 1, "_id": 1}},
+            {"$facet": {
+                "by_status": [
+                    {"$group": {"_id": "$Status", "count": {"$sum": 1}}}
+                ],
+                "by_week": [
+                    {"$group": {
+                        "_id": due_week("DueDate"),
+                        "count": {"$sum": 1},
+                        "overdue": {"$sum": {"$cond": [{"$eq": ["$Overdue", True]}, 1, 0]}}
+                    }},
+                    {"$sort": {"_id": 1}}
+                ],
+                "tasks": [
+                    {"$skip": (page - 1) * page_size},
+                    {"$limit": page_size},
+                    {"$lookup": {
+                        "from": projects_collection.name,
+                        "let": {"project_id": "$ProjectID"},
+                        "pipeline": [
+                            {"$match": {"$expr": {"$eq": ["$_id", "$$project_id"]}, **NOT_DELETED}},
+                            {"$project": {"_id": 0, "ProjectName": 1}}
+                        ],
+                        "as": "Project"
+                    }},
+                    {"$unwind": "$Project"},
+                    {"$addFields": {"ProjectName": "$Project.ProjectName"}},
+                    {"$project": {"Project": 0, "Description": 0}}
+                ]
+            }}
+        ]
+        result = next(db.tasks.aggregate(pipeline))
+
+        by_status = {row['_id']: row['count'] for row in result['by_status']}
+        response = {
+            "total_tasks": sum(by_status.values()),
+            "by_status": by_status,
+            "by_week": [{"week": format_date(row['_id']), "count": row['count'], "overdue": row['overdue']}
+                        for row in result['by_week']],  # week None: task không có DueDate
+            "page": page,
+            "page_size": page_size,
+            "tasks": [format_dates(task) for task in result['tasks']]
+        }
+        return jsonify(response), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
 
+# ----------------------------- APP FACTORY ----------------------------- #
+def create_app(config=None, mongo_client=None):
+    # mongo_client: dùng client có sẵn (vd: mongomock) thay vì tạo từ MONGO_URI
+    app = Flask(__name__)
+    app.config.from_mapping(DEFAULT_CONFIG)
+    app.config.from_prefixed_env()
+    if config:
+        app.config.from_mapping(config)
+
+    if app.config['REPORT_READ_PREFERENCE'] not in READ_PREFERENCES:
+        raise ValueError(f"REPORT_READ_PREFERENCE must be one of: {', '.join(READ_PREFERENCES)}")
+    if app.config['PROJECT_EVENTS_SOURCE'] not in EVENT_SOURCES:
+        raise ValueError(f"PROJECT_EVENTS_SOURCE must be one of: {', '.join(EVENT_SOURCES)}")
+
+    app.json = JSONProvider(app)
+    app.extensions['mongo'] = MongoConnection(app.config, mongo_client)
+    app.extensions['name_cache'] = NameCache(app.config['NAME_CACHE_SIZE'], app.config['NAME_CACHE_TTL'])
+    app.extensions['hash_pool'] = HashPool(app.config['HASH_POOL_KIND'], app.config['HASH_POOL_WORKERS'],
+                                           app.config['HASH_QUEUE_SIZE'], app.config['HASH_TIMEOUT'])
+    app.extensions['background_jobs'] = [
+        BackgroundJob(app, OVERDUE_LOCK, lambda renew: mark_overdue(app.config['OVERDUE_JOB_DRY_RUN']),
+                      'OVERDUE_JOB_INTERVAL', 'OVERDUE_JOB_LEASE'),
+        BackgroundJob(app, PURGE_LOCK, purge_deleted, 'DELETION_JOB_INTERVAL', 'DELETION_JOB_LEASE'),
+        BackgroundJob(app, ARCHIVE_LOCK, archive_projects, 'ARCHIVE_JOB_INTERVAL', 'ARCHIVE_JOB_LEASE')
+    ]
+    if app.config['PROGRESS_BUFFER_MS']:
+        buffer = ProgressBuffer(app, app.config['PROGRESS_BUFFER_MS'], app.config['PROGRESS_BUFFER_MAX'])
+        app.extensions['progress_buffer'] = buffer
+        atexit.register(buffer.flush)
+    app.extensions['project_events'] = ProjectEvents(app, app.config['PROJECT_EVENTS_SOURCE'],
+                                                     app.config['PROJECT_EVENTS_BACKLOG'],
+                                                     app.config['PROJECT_EVENTS_QUEUE'])
+    app.register_blueprint(bp)
+    setup_profiling(app)
+    if app.config['ENSURE_INDEXES']:
+        app.extensions['ensure_indexes'] = ensure_indexes_in_background(app)
+    return app
+
+
+# `flask --app main` tự tìm create_app, WSGI server dùng "main:create_app()". Không tạo app khi import:
+# mỗi lần import sẽ mở thêm một MongoClient (và thread tạo index) không ai dùng
 if __name__ == "__main__":
-    app.run(host='0.0.0.0', debug=True)  
\ No newline at end of file
+    create_app().run(host='0.0.0.0', debug=True)  
\ No newline at end of file
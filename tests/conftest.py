@@ -0,0 +1,83 @@
+import mongomock
+import pytest
+from bson import ObjectId
+
+import main
+
+
+TEST_CONFIG = {
+    "TESTING": True,
+    "OVERDUE_JOB_INTERVAL": 0,
+    "DELETION_JOB_INTERVAL": 0,
+    "ARCHIVE_JOB_INTERVAL": 0,
+    "ENSURE_INDEXES": False
+}
+
+
+def make_app(mongo_client=None, **overrides):
+    # mongomock thay cho MongoDB thật; tắt các job nền để test không chạy song song với chúng
+    return main.create_app({**TEST_CONFIG, **overrides}, mongo_client=mongo_client or mongomock.MongoClient())
+
+
+@pytest.fixture
+def app():
+    app = make_app()
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def database(app):
+    return main.get_db()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def owner(database):
+    user_id = database.user.insert_one({"Username": "owner", "Email": "owner@example.com", "Name": "Owner"}).inserted_id
+    return user_id
+
+
+def make_project(database, owner_id, **fields):
+    project = {
+        "ProjectName": "Project",
+        "Description": "",
+        "Status": "Ongoing",
+        "CreatedBy": owner_id,
+        "Members": [{"MemberID": owner_id, "Role": "Owner"}],
+        "Revision": 0,
+        "TaskCounts": {"Total": 0},
+        **fields
+    }
+    return database.project.insert_one(project).inserted_id
+
+
+def new_id():
+    return str(ObjectId())
+
+
+def count_calls(monkeypatch, methods):
+    # mongomock không phát command event nên đếm các lệnh ở tầng Collection; các method của mongomock
+    # gọi lẫn nhau (find_one gọi find...) nên chỉ đếm lời gọi ngoài cùng. Trả về list (collection, method)
+    calls = []
+    depth = [0]
+
+    def counting(name, original):
+        def wrapper(self, *args, **kwargs):
+            if depth[0] == 0:
+                calls.append((self.name, name))
+            depth[0] += 1
+            try:
+                return original(self, *args, **kwargs)
+            finally:
+                depth[0] -= 1
+        return wrapper
+
+    for name in methods:
+        monkeypatch.setattr(mongomock.collection.Collection, name,
+                            counting(name, getattr(mongomock.collection.Collection, name)))
+    return calls
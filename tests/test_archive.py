@@ -0,0 +1,74 @@
+import mongomock
+import pytest
+
+import main
+from conftest import make_project
+
+
+@pytest.fixture
+def finished_project(database, owner):
+    project_id = make_project(database, owner, Status="Completed", EndDate="2000-01-01")
+    database.tasks.insert_many([{"ProjectID": project_id, "Status": "Completed"} for _ in range(5)])
+    return project_id
+
+
+def test_archive_then_restore_moves_all_tasks(app, database, finished_project):
+    app.config['ARCHIVE_BATCH_SIZE'] = 2
+
+    assert main.archive_projects() == {"archived": 1, "skipped": 0, "dry_run": False}
+    assert database.project.find_one({"_id": finished_project}) is None
+    assert database.tasks.count_documents({"ProjectID": finished_project}) == 0
+    assert database.tasks_archive.count_documents({"ProjectID": finished_project}) == 5
+    assert "Archiving" not in database.project_archive.find_one({"_id": finished_project})
+
+    assert main.restore_project(finished_project)['Revision'] == 1
+    assert database.tasks.count_documents({"ProjectID": finished_project}) == 5
+    assert database.tasks_archive.count_documents({}) == 0
+    assert database.project_archive.count_documents({}) == 0
+
+
+def test_task_created_while_archiving_is_archived(monkeypatch, database, finished_project):
+    # create_task chèn task ngay trước khi project nóng bị xóa, lúc Revision chưa kịp tăng
+    original_delete_one = mongomock.collection.Collection.delete_one
+    late_task = {}
+
+    def delete_one(self, filter, *args, **kwargs):
+        if self.name == "project" and not late_task:
+            late_task['_id'] = database.tasks.insert_one({"ProjectID": finished_project, "Status": "Pending"}).inserted_id
+        return original_delete_one(self, filter, *args, **kwargs)
+
+    monkeypatch.setattr(mongomock.collection.Collection, "delete_one", delete_one)
+
+    assert main.archive_projects()['archived'] == 1
+    assert database.tasks.count_documents({}) == 0
+    assert database.tasks_archive.find_one({"_id": late_task['_id']}) is not None
+    assert database.tasks_archive.count_documents({"ProjectID": finished_project}) == 6
+
+
+def test_project_changed_while_archiving_is_skipped(monkeypatch, database, finished_project):
+    original_delete_one = mongomock.collection.Collection.delete_one
+
+    def delete_one(self, filter, *args, **kwargs):
+        if self.name == "project":
+            database.project.update_one({"_id": finished_project}, {"$inc": {"Revision": 1}})
+        return original_delete_one(self, filter, *args, **kwargs)
+
+    monkeypatch.setattr(mongomock.collection.Collection, "delete_one", delete_one)
+
+    assert main.archive_projects() == {"archived": 0, "skipped": 1, "dry_run": False}
+    assert database.project.find_one({"_id": finished_project})['Revision'] == 1
+    assert database.tasks.count_documents({"ProjectID": finished_project}) == 5
+    assert database.project_archive.count_documents({}) == 0
+    assert database.tasks_archive.count_documents({}) == 0
+
+
+def test_resume_moves_tasks_left_behind(database, finished_project):
+    # Worker chết sau khi xóa project nóng nhưng trước khi chuyển tasks
+    project = database.project.find_one({"_id": finished_project})
+    database.project_archive.insert_one({**project, "Archiving": True})
+    database.project.delete_one({"_id": finished_project})
+
+    assert main.archive_projects()['archived'] == 0
+    assert database.tasks.count_documents({}) == 0
+    assert database.tasks_archive.count_documents({"ProjectID": finished_project}) == 5
+    assert "Archiving" not in database.project_archive.find_one({"_id": finished_project})
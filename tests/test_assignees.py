@@ -0,0 +1,41 @@
+from bson import ObjectId
+
+import main
+from conftest import make_project
+
+
+def test_update_task_stores_assignee_as_object_id(client, database, owner):
+    project_id = make_project(database, owner)
+    task_id = database.tasks.insert_one({"ProjectID": project_id, "AssignedTo": owner, "Status": "Pending"}).inserted_id
+    assignee = database.user.insert_one({"Username": "member", "Name": "Member"}).inserted_id
+
+    response = client.put("/update_task", json={"TaskID": str(task_id), "AssignedTo": str(assignee)})
+
+    assert response.status_code == 200
+    # /workload so khớp AssignedTo dạng ObjectId
+    assert database.tasks.find_one({"_id": task_id})['AssignedTo'] == assignee
+
+
+def test_update_task_rejects_invalid_assignee(client, database, owner):
+    project_id = make_project(database, owner)
+    task_id = database.tasks.insert_one({"ProjectID": project_id, "AssignedTo": owner, "Status": "Pending"}).inserted_id
+
+    response = client.put("/update_task", json={"TaskID": str(task_id), "AssignedTo": "not-an-id"})
+
+    assert response.status_code == 400
+    assert database.tasks.find_one({"_id": task_id})['AssignedTo'] == owner
+
+
+def test_migrate_assignees_converts_strings(app, database, owner):
+    assignee = ObjectId()
+    string_task = database.tasks.insert_one({"AssignedTo": str(assignee)}).inserted_id
+    invalid_task = database.tasks.insert_one({"AssignedTo": "someone"}).inserted_id
+    database.tasks.insert_one({"AssignedTo": owner})
+
+    result = main.migrate_assignees(batch_size=2, rate=0)
+
+    assert (result['Converted'], result['Invalid'], result['Done']) == (1, 1, True)
+    assert database.tasks.find_one({"_id": string_task})['AssignedTo'] == assignee
+    assert database.tasks.find_one({"_id": invalid_task})['AssignedTo'] == "someone"
+    # Checkpoint Done: chạy lại không quét nữa
+    assert main.migrate_assignees(rate=0)['Converted'] == 1
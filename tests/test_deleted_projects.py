@@ -0,0 +1,41 @@
+import main
+from conftest import make_project
+
+
+def deleted_project_task(database, owner):
+    project_id = make_project(database, owner, Deleted=True)
+    task_id = database.tasks.insert_one({"ProjectID": project_id, "Status": "Pending", "Progress": 0}).inserted_id
+    return project_id, task_id
+
+
+def test_update_task_on_deleted_project_returns_404(client, database, owner):
+    project_id, task_id = deleted_project_task(database, owner)
+
+    response = client.put("/update_task", json={"TaskID": str(task_id), "Status": "Completed"})
+
+    assert response.status_code == 404
+    assert database.tasks.find_one({"_id": task_id})['Status'] == "Pending"
+    assert database.project.find_one({"_id": project_id})['Revision'] == 0
+
+
+def test_update_task_progress_on_deleted_project_returns_404(client, database, owner):
+    project_id, task_id = deleted_project_task(database, owner)
+
+    response = client.put("/update_task_progress", json={"TaskID": str(task_id), "Progress": 50})
+
+    assert response.status_code == 404
+    assert database.tasks.find_one({"_id": task_id})['Progress'] == 0
+    assert database.project.find_one({"_id": project_id})['Revision'] == 0
+
+
+def test_write_progress_skips_deleted_projects(database, owner):
+    deleted_id, deleted_task = deleted_project_task(database, owner)
+    live_id = make_project(database, owner)
+    live_task = database.tasks.insert_one({"ProjectID": live_id, "Status": "Pending", "Progress": 0}).inserted_id
+
+    main.write_progress({deleted_task: 70, live_task: 80})
+
+    assert database.tasks.find_one({"_id": deleted_task})['Progress'] == 0
+    assert database.tasks.find_one({"_id": live_task})['Progress'] == 80
+    assert database.project.find_one({"_id": deleted_id})['Revision'] == 0
+    assert database.project.find_one({"_id": live_id})['Revision'] == 1
@@ -0,0 +1,21 @@
+import mongomock
+
+import main
+from conftest import make_app
+
+
+def test_create_app_creates_indexes():
+    client = mongomock.MongoClient()
+    app = make_app(client, ENSURE_INDEXES=True)
+    app.extensions['ensure_indexes'].join(timeout=10)
+
+    database = client[app.config['MONGO_DB']]
+    for collection_name, models in main.INDEXES.items():
+        existing = database[collection_name].index_information()
+        for model in models:
+            assert model.document['name'] in existing
+
+
+def test_ensure_indexes_can_be_disabled():
+    app = make_app(ENSURE_INDEXES=False)
+    assert 'ensure_indexes' not in app.extensions
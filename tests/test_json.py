@@ -0,0 +1,27 @@
+import dataclasses
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+from bson import ObjectId
+from flask.json.provider import DefaultJSONProvider
+
+
+@dataclasses.dataclass
+class Point:
+    x: int
+
+
+def test_mongo_types_are_serialized(app):
+    object_id = ObjectId()
+    created = datetime(2024, 1, 2, 3, 4, 5)
+
+    assert app.json.loads(app.json.dumps({"_id": object_id, "CreateDate": created})) == {
+        "_id": str(object_id), "CreateDate": "2024-01-02T03:04:05"
+    }
+
+
+def test_other_types_fall_back_to_flask(app):
+    value = {"date": date(2024, 1, 2), "uuid": uuid.uuid4(), "decimal": Decimal("1.5"), "point": Point(1)}
+
+    assert app.json.dumps(value) == DefaultJSONProvider(app).dumps(value)
@@ -0,0 +1,122 @@
+import mongomock
+import pytest
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from conftest import count_calls, make_project
+
+ROLES = {"creator": "Owner", "co_owner": "Owner", "admin": "Admin", "admin2": "Admin",
+         "member": "Member", "viewer": "Viewer"}
+
+
+@pytest.fixture(autouse=True)
+def array_filters(monkeypatch):
+    # mongomock bỏ qua array_filters: áp điều kiện ghi bằng find_one rồi tự đổi Role của phần tử target
+    original = mongomock.collection.Collection.find_one_and_update
+
+    def find_one_and_update(self, filter, update, projection=None, array_filters=None,
+                            return_document=ReturnDocument.BEFORE, **kwargs):
+        if not array_filters:
+            return original(self, filter, update, projection=projection, return_document=return_document, **kwargs)
+        project = self.find_one(filter)
+        if project is None:
+            return None
+        member_id = array_filters[0]['target.MemberID']
+        for member in project['Members']:
+            if member['MemberID'] == member_id:
+                member['Role'] = update['$set']['Members.$[target].Role']
+        project['Revision'] += update['$inc']['Revision']
+        self.replace_one({"_id": project['_id']}, project)
+        return self.find_one({"_id": project['_id']}, projection)
+
+    monkeypatch.setattr(mongomock.collection.Collection, "find_one_and_update", find_one_and_update)
+
+
+@pytest.fixture
+def team(database):
+    users = {name: database.user.insert_one({"Username": name, "Name": name}).inserted_id
+             for name in [*ROLES, "outsider"]}
+    project_id = make_project(database, users['creator'],
+                              Members=[{"MemberID": users[name], "Role": role} for name, role in ROLES.items()])
+    return project_id, users
+
+
+def update_role(client, project_id, users, actor, target, role):
+    return client.put("/update_member_role", json={"AdminID": str(users[actor]), "ProjectID": str(project_id),
+                                                   "Identifier": target, "Role": role})
+
+
+def role_of(database, project_id, user_id):
+    project = database.project.find_one({"_id": project_id})
+    return next(member['Role'] for member in project['Members'] if member['MemberID'] == user_id)
+
+
+@pytest.mark.parametrize("actor, target, role, status, error", [
+    ("admin", "creator", "Member", 403, "Admin cannot change or remove the role of the Creator (Owner)."),
+    ("admin", "co_owner", "Member", 403, "Admin cannot change or remove the role of the Creator (Owner)."),
+    ("admin", "admin2", "Member", 403, "Admin cannot change the role of another Admin."),
+    ("admin", "member", "Owner", 403, "Admin cannot change another user's role to Owner."),
+    ("co_owner", "member", "Viewer", 403, "Only Admin or Creator can update member roles."),
+    ("member", "viewer", "Member", 403, "Only Admin or Creator can update member roles."),
+    ("outsider", "viewer", "Member", 403, "Only Admin or Creator can update member roles."),
+    ("creator", "outsider", "Member", 500, "Failed to update member role."),
+    ("admin", "outsider", "Member", 500, "Failed to update member role."),
+    ("creator", "nobody", "Member", 404, "Member not found with the provided Username or Email."),
+])
+def test_update_member_role_denials(client, database, team, actor, target, role, status, error):
+    project_id, users = team
+
+    response = update_role(client, project_id, users, actor, target, role)
+
+    assert (response.status_code, response.get_json()['error']) == (status, error)
+    assert database.project.find_one({"_id": project_id})['Revision'] == 0
+
+
+def test_update_member_role_missing_project(client, team):
+    project_id, users = team
+    response = update_role(client, ObjectId(), users, "creator", "member", "Viewer")
+    assert (response.status_code, response.get_json()['error']) == (404, "Project not found.")
+
+
+@pytest.mark.parametrize("actor, target, role", [
+    ("creator", "admin", "Owner"),
+    ("creator", "co_owner", "Viewer"),
+    ("admin", "member", "Viewer"),
+    ("admin", "viewer", "Admin"),
+])
+def test_update_member_role_allowed(client, database, team, actor, target, role):
+    project_id, users = team
+
+    response = update_role(client, project_id, users, actor, target, role)
+
+    assert response.status_code == 200
+    assert role_of(database, project_id, users[target]) == role
+    assert database.project.find_one({"_id": project_id})['Revision'] == 1
+
+
+def test_update_member_role_round_trips(monkeypatch, client, team):
+    project_id, users = team
+    calls = count_calls(monkeypatch, ["find", "find_one", "find_one_and_update"])
+
+    assert update_role(client, project_id, users, "admin", "member", "Viewer").status_code == 200
+    # Tìm user, rồi kiểm tra quyền và ghi trong cùng một lệnh
+    assert calls == [("user", "find_one"), ("project", "find_one_and_update")]
+
+    calls.clear()
+    assert update_role(client, project_id, users, "admin", "admin2", "Viewer").status_code == 403
+    # Chỉ khi không ghi được mới đọc project để trả đúng lỗi
+    assert calls == [("user", "find_one"), ("project", "find_one_and_update"), ("project", "find_one")]
+
+
+@pytest.mark.parametrize("actor, status", [
+    ("creator", 202), ("co_owner", 202), ("admin", 403), ("member", 403), ("outsider", 403)
+])
+def test_delete_project_permissions(client, database, team, actor, status):
+    project_id, users = team
+
+    response = client.delete("/deleteproject", json={"AdminID": str(users[actor]), "ProjectID": str(project_id)})
+
+    assert response.status_code == status
+    assert bool(database.project.find_one({"_id": project_id}).get('Deleted')) == (status == 202)
+    if status == 403:
+        assert response.get_json()['error'] == "Only the Creator or Owner can delete the project."
@@ -0,0 +1,69 @@
+import mongomock
+import pytest
+
+import main
+
+
+@pytest.fixture
+def users(database):
+    ids = database.user.insert_many([{"Username": f"user{i}", "Name": f"User {i}"} for i in range(5)]).inserted_ids
+    return ids
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(main.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_lru_evicts_least_recently_used(app, users):
+    cache = main.NameCache(max_size=3, ttl=60)
+    cache.get_many(users[:3])
+    cache.get_many([users[0]])  # users[0] mới được dùng, users[1] cũ nhất
+    cache.get_many([users[3]])
+
+    assert list(cache._entries) == [users[2], users[0], users[3]]
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entries_expire_after_ttl(app, database, users, clock):
+    cache = main.NameCache(max_size=10, ttl=60)
+    assert cache.get_many([users[0]])[users[0]]['Name'] == "User 0"
+    database.user.update_one({"_id": users[0]}, {"$set": {"Name": "Renamed"}})
+
+    clock[0] += 59
+    assert cache.get_many([users[0]])[users[0]]['Name'] == "User 0"
+    clock[0] += 2
+    assert cache.get_many([users[0]])[users[0]]['Name'] == "Renamed"
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_invalidate_forces_reload(app, database, users):
+    cache = main.NameCache(max_size=10, ttl=60)
+    cache.get_many(users[:2])
+    database.user.update_one({"_id": users[0]}, {"$set": {"Name": "Renamed"}})
+
+    cache.invalidate([users[0]])
+
+    assert users[0] not in cache._entries and users[1] in cache._entries
+    assert cache.get_many([users[0]])[users[0]]['Name'] == "Renamed"
+
+
+def test_stale_lookup_is_not_cached_after_invalidate(app, database, users, monkeypatch):
+    cache = main.NameCache(max_size=10, ttl=60)
+    original = mongomock.collection.Collection.find
+
+    def find_then_rename(self, *args, **kwargs):
+        # Đọc xong tên cũ thì user được đổi tên và cache bị invalidate trước khi kết quả được ghi vào cache
+        cursor = list(original(self, *args, **kwargs))
+        database.user.update_one({"_id": users[0]}, {"$set": {"Name": "Renamed"}})
+        cache.invalidate([users[0]])
+        return cursor
+
+    monkeypatch.setattr(mongomock.collection.Collection, "find", find_then_rename)
+    assert cache.get_many([users[0]])[users[0]]['Name'] == "User 0"
+    monkeypatch.undo()
+
+    assert users[0] not in cache._entries
+    assert cache.get_many([users[0]])[users[0]]['Name'] == "Renamed"
@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+
+import main
+from conftest import make_project
+
+
+def midnight(days):
+    day = datetime.utcnow() + timedelta(days=days)
+    return datetime(day.year, day.month, day.day)
+
+
+def test_mark_overdue_sets_and_clears_flag(database, owner):
+    project_id = make_project(database, owner)
+    ids = database.tasks.insert_many([
+        {"ProjectID": project_id, "Status": "Pending", "DueDate": midnight(-2), "Overdue": False},
+        # Đổi bởi API Node hoặc sửa tay: Overdue vẫn còn True
+        {"ProjectID": project_id, "Status": "Completed", "DueDate": midnight(-2), "Overdue": True},
+        {"ProjectID": project_id, "Status": "Pending", "DueDate": midnight(5), "Overdue": True},
+        {"ProjectID": project_id, "Status": "Pending", "DueDate": midnight(-1), "Overdue": True},
+    ]).inserted_ids
+
+    assert main.mark_overdue(dry_run=True)['cleared_tasks'] == 2
+    result = main.mark_overdue()
+
+    assert result['overdue_tasks'] == 1
+    assert result['cleared_tasks'] == 2
+    flags = [database.tasks.find_one({"_id": task_id})['Overdue'] for task_id in ids]
+    assert flags == [True, False, False, True]
+    assert database.project.find_one({"_id": project_id})['Revision'] == 1
+
+
+def test_mark_overdue_clears_legacy_string_dates(database, owner):
+    project_id = make_project(database, owner)
+    later = midnight(3).strftime(main.DATE_FORMAT)
+    task_id = database.tasks.insert_one({"ProjectID": project_id, "Status": "Pending", "DueDate": later,
+                                         "Overdue": True}).inserted_id
+
+    main.mark_overdue()
+
+    assert database.tasks.find_one({"_id": task_id})['Overdue'] is False
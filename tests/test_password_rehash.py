@@ -0,0 +1,46 @@
+import pytest
+from werkzeug.security import generate_password_hash
+
+import main
+from conftest import make_app
+
+
+@pytest.fixture
+def scrypt_app():
+    # Method viết tắt: werkzeug lưu thành "scrypt:32768:8:1$..."
+    app = make_app(PASSWORD_HASH_METHOD="scrypt")
+    with app.app_context():
+        yield app
+
+
+def login(app, password="secret"):
+    return app.test_client().post("/login", json={"Identifier": "user", "Password": password})
+
+
+def test_short_method_name_does_not_rehash_every_login(scrypt_app):
+    database = main.get_db()
+    stored = generate_password_hash("secret", "scrypt")
+    user_id = database.user.insert_one({"Username": "user", "Password": stored}).inserted_id
+
+    for _ in range(2):
+        assert login(scrypt_app).status_code == 200
+    assert database.user.find_one({"_id": user_id})['Password'] == stored
+
+
+def test_old_parameters_are_rehashed_on_login(scrypt_app):
+    database = main.get_db()
+    user_id = database.user.insert_one({"Username": "user",
+                                        "Password": generate_password_hash("secret", "pbkdf2:sha256:1000")}).inserted_id
+
+    assert login(scrypt_app).status_code == 200
+    assert database.user.find_one({"_id": user_id})['Password'].startswith("scrypt:32768:8:1$")
+
+
+@pytest.mark.parametrize("method, stored_method, expected", [
+    ("pbkdf2:sha256:1000", "pbkdf2:sha256:1000", False),
+    ("pbkdf2:sha256:2000", "pbkdf2:sha256:1000", True),
+    ("scrypt:32768:8:1", "scrypt", False),
+])
+def test_needs_rehash(app, method, stored_method, expected):
+    app.config['PASSWORD_HASH_METHOD'] = method
+    assert main.needs_rehash(generate_password_hash("x", stored_method)) is expected
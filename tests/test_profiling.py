@@ -0,0 +1,32 @@
+import pytest
+
+import main
+from conftest import make_app
+
+
+def test_disabled_profiling_adds_no_hooks():
+    app = make_app()
+
+    assert main.start_profile not in app.before_request_funcs.get(None, [])
+    assert main.finish_profile not in app.after_request_funcs.get(None, [])
+    assert not [rule for rule in app.url_map.iter_rules() if rule.rule.startswith("/admin/profiles")]
+
+
+def test_sample_rate_without_token_is_rejected():
+    with pytest.raises(ValueError, match="PROFILE_TOKEN"):
+        make_app(PROFILE_SAMPLE_RATE=0.5)
+
+
+def test_sampled_profiles_can_be_listed_and_downloaded(tmp_path):
+    app = make_app(PROFILE_SAMPLE_RATE=1.0, PROFILE_TOKEN="secret", PROFILE_DIR=str(tmp_path), PROFILE_KEEP=2)
+    client = app.test_client()
+    for _ in range(3):
+        assert client.get("/cache_stats").status_code == 200
+
+    assert client.get("/admin/profiles").status_code == 403
+    profiles = client.get("/admin/profiles", headers={"X-Profile-Token": "secret"}).get_json()['profiles']
+    # PROFILE_KEEP = 2 file mới nhất cho mỗi route
+    assert [profile['route'] for profile in profiles].count("cache_stats") == 2
+
+    download = client.get(profiles[0]['url'], headers={"X-Profile-Token": "secret"})
+    assert download.status_code == 200 and download.data
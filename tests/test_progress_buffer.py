@@ -0,0 +1,84 @@
+import pytest
+
+import main
+from conftest import make_app, make_project
+
+
+@pytest.fixture
+def buffered_app(monkeypatch):
+    registered = []
+    monkeypatch.setattr(main.atexit, "register", registered.append)
+    # Chu kỳ dài để thread nền không flush trong lúc test, test tự gọi flush()
+    app = make_app(PROGRESS_BUFFER_MS=600000, PROGRESS_BUFFER_MAX=1000)
+    app.registered_at_exit = registered
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def task(buffered_app):
+    database = main.get_db()
+    project_id = make_project(database, database.user.insert_one({"Name": "Owner"}).inserted_id)
+    task_id = database.tasks.insert_one({"ProjectID": project_id, "Status": "Pending", "Progress": 0}).inserted_id
+    return database, project_id, task_id
+
+
+def progress(database, task_id):
+    return database.tasks.find_one({"_id": task_id})['Progress']
+
+
+def test_updates_are_buffered_until_flush(buffered_app, task):
+    database, project_id, task_id = task
+    buffer = buffered_app.extensions['progress_buffer']
+    client = buffered_app.test_client()
+
+    for value in (10, 20, 30):
+        assert client.put("/update_task_progress", json={"TaskID": str(task_id), "Progress": value}).status_code == 202
+    assert progress(database, task_id) == 0 and buffer.depth() == 1
+
+    assert buffer.flush() == 1
+    assert progress(database, task_id) == 30
+    assert database.project.find_one({"_id": project_id})['Revision'] == 1
+    assert buffer.depth() == 0 and buffer.flushed == 1
+
+
+def test_flush_is_registered_at_exit(buffered_app):
+    assert buffered_app.registered_at_exit == [buffered_app.extensions['progress_buffer'].flush]
+
+
+def test_failed_flush_is_requeued(buffered_app, task, monkeypatch):
+    database, _, task_id = task
+    buffer = buffered_app.extensions['progress_buffer']
+    original = main.write_progress
+
+    def failing(entries):
+        raise RuntimeError("primary stepped down")
+
+    buffer.put(task_id, 40)
+    monkeypatch.setattr(main, "write_progress", failing)
+    assert buffer.flush() == 0
+    assert buffer.failures == 1 and buffer.depth() == 1
+    assert progress(database, task_id) == 0
+
+    monkeypatch.setattr(main, "write_progress", original)
+    assert buffer.flush() == 1
+    assert progress(database, task_id) == 40
+
+
+def test_newer_value_wins_over_requeued_one(buffered_app, task, monkeypatch):
+    database, _, task_id = task
+    buffer = buffered_app.extensions['progress_buffer']
+    original = main.write_progress
+
+    def fail_after_newer_update(entries):
+        # Client gửi giá trị mới trong lúc flush đang ghi giá trị cũ thì lần ghi đó lỗi
+        buffer.put(task_id, 90)
+        raise RuntimeError("write failed")
+
+    buffer.put(task_id, 50)
+    monkeypatch.setattr(main, "write_progress", fail_after_newer_update)
+    buffer.flush()
+
+    monkeypatch.setattr(main, "write_progress", original)
+    buffer.flush()
+    assert progress(database, task_id) == 90
@@ -0,0 +1,118 @@
+import pytest
+
+import main
+from conftest import make_app, make_project
+
+
+@pytest.fixture
+def events_app():
+    # Heartbeat/timeout ngắn để vòng lặp của stream không giữ test lâu
+    app = make_app(PROJECT_EVENTS_HEARTBEAT=0.05, PROJECT_EVENTS_TIMEOUT=2,
+                   PROJECT_EVENTS_BACKLOG=3, PROJECT_EVENTS_QUEUE=2)
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def setup(events_app):
+    database = main.get_db()
+    owner = database.user.insert_one({"Username": "owner", "Name": "Owner"}).inserted_id
+    project_id = make_project(database, owner)
+    return events_app.test_client(), events_app.extensions['project_events'], owner, project_id
+
+
+def open_stream(client, owner, project_id, **headers):
+    response = client.get(f"/project_events?ProjectID={project_id}&UserID={owner}", headers=headers,
+                          buffered=False)
+    assert response.status_code == 200
+    return response, iter(response.response)
+
+
+def next_event(chunks):
+    # Bỏ qua heartbeat, trả về (id, loại) của sự kiện tiếp theo
+    for chunk in chunks:
+        lines = chunk.decode().splitlines()
+        if lines and lines[0].startswith("id: "):
+            return int(lines[0][4:]), lines[1][7:]
+    return None
+
+
+def create_task(client, owner, project_id):
+    response = client.post("/create_task", json={"AdminID": str(owner), "ProjectID": str(project_id),
+                                                 "AssignedTo": str(owner), "TaskName": "task",
+                                                 "DueDate": "2030-01-01"})
+    assert response.status_code == 201
+
+
+def test_create_task_is_delivered_live(setup):
+    client, events, owner, project_id = setup
+    response, chunks = open_stream(client, owner, project_id)
+    assert next(chunks) == b": connected\n\n"
+
+    create_task(client, owner, project_id)
+
+    assert next_event(chunks) == (1, "tasks")
+    response.close()
+
+
+def test_last_event_id_replays_ring_buffer(setup):
+    client, events, owner, project_id = setup
+    for _ in range(3):
+        create_task(client, owner, project_id)
+
+    response, chunks = open_stream(client, owner, project_id, **{"Last-Event-ID": "1"})
+
+    assert [next_event(chunks), next_event(chunks)] == [(2, "tasks"), (3, "tasks")]
+    assert next(chunks) == b": connected\n\n"
+    response.close()
+
+
+def test_gap_in_ring_buffer_sends_single_resync(setup):
+    client, events, owner, project_id = setup
+    for _ in range(5):
+        create_task(client, owner, project_id)  # Ring buffer chỉ giữ Revision 3..5
+
+    response, chunks = open_stream(client, owner, project_id, **{"Last-Event-ID": "1"})
+
+    assert next_event(chunks) == (5, "resync")
+    assert next(chunks) == b": connected\n\n"
+    response.close()
+
+
+def test_queue_overflow_sends_resync(setup):
+    client, events, owner, project_id = setup
+    response, chunks = open_stream(client, owner, project_id)
+    assert next(chunks) == b": connected\n\n"
+
+    for _ in range(3):
+        create_task(client, owner, project_id)  # Sự kiện thứ ba làm đầy hàng đợi 2 chỗ
+
+    assert events.dropped == 1
+    assert next_event(chunks) == (3, "resync")
+    response.close()
+
+
+def test_deleted_event_closes_stream(setup):
+    client, events, owner, project_id = setup
+    response, chunks = open_stream(client, owner, project_id)
+    assert next(chunks) == b": connected\n\n"
+
+    assert client.delete("/deleteproject", json={"AdminID": str(owner),
+                                                 "ProjectID": str(project_id)}).status_code == 202
+
+    assert next_event(chunks) == (1, "deleted")
+    assert next(chunks, None) is None
+    assert events.subscriber_count() == 0
+
+
+def test_closing_response_unsubscribes(setup):
+    client, events, owner, project_id = setup
+    # HEAD và client ngắt trước chunk đầu: generator không chạy nhưng vẫn phải hủy đăng ký
+    for _ in range(3):
+        client.head(f"/project_events?ProjectID={project_id}&UserID={owner}").close()
+    response, chunks = open_stream(client, owner, project_id)
+    assert events.subscriber_count() == 1
+
+    response.close()
+
+    assert events.subscriber_count() == 0
@@ -0,0 +1,66 @@
+import threading
+from collections import Counter
+
+import mongomock
+
+from conftest import make_project
+
+
+def add_users(database, count):
+    return [database.user.insert_one({"Username": f"user{i}", "Email": f"user{i}@example.com",
+                                      "Name": f"User {i}"}).inserted_id for i in range(count)]
+
+
+def member_ids(database, project_id):
+    return [member['MemberID'] for member in database.project.find_one({"_id": project_id})['Members']]
+
+
+def test_parallel_invites_do_not_duplicate_members(app, database, owner):
+    project_id = make_project(database, owner)
+    user_ids = add_users(database, 12)
+    barrier = threading.Barrier(8)
+    statuses = []
+
+    def invite(offset):
+        # Các request chồng lên nhau: mỗi request mời 6 user liên tiếp
+        identifiers = [f"user{(offset + i) % 12}" for i in range(6)]
+        client = app.test_client()
+        barrier.wait()
+        response = client.post("/project_members", json={"AdminID": str(owner), "ProjectID": str(project_id),
+                                                          "Identifiers": identifiers, "Role": "Member"})
+        statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=invite, args=(offset,)) for offset in range(0, 16, 2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    members = member_ids(database, project_id)
+    assert not [member for member, count in Counter(members).items() if count > 1]
+    assert set(members) == {owner, *user_ids}
+    assert set(statuses) <= {201, 400, 409}
+
+
+def test_invite_retries_after_concurrent_add(client, database, owner, monkeypatch):
+    project_id = make_project(database, owner)
+    user_ids = add_users(database, 3)
+    original = mongomock.collection.Collection.find_one_and_update
+    calls = []
+
+    def racing_update(self, filter, update, *args, **kwargs):
+        # Lần ghi đầu tiên: một request khác vừa thêm user0 giữa lúc đọc Members và lúc ghi
+        if not calls:
+            database.project.update_one({"_id": project_id},
+                                        {"$push": {"Members": {"MemberID": user_ids[0], "Role": "Viewer"}}})
+        calls.append(filter)
+        return original(self, filter, update, *args, **kwargs)
+
+    monkeypatch.setattr(mongomock.collection.Collection, "find_one_and_update", racing_update)
+    response = client.post("/project_members", json={"AdminID": str(owner), "ProjectID": str(project_id),
+                                                     "Identifiers": ["user0", "user1", "user2"], "Role": "Member"})
+
+    assert response.status_code == 201
+    assert len(calls) == 2
+    members = member_ids(database, project_id)
+    assert sorted(members) == sorted([owner, *user_ids])
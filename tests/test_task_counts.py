@@ -0,0 +1,110 @@
+import random
+
+import mongomock
+
+import main
+from conftest import make_project
+
+STATUSES = ["Pending", "Ongoing", "Completed", "Delayed", "bad.status"]
+
+
+def stored_counts(database, project_ids):
+    projects = list(database.project.find({"_id": {"$in": project_ids}}, {"TaskCounts": 1}))
+    counts = main.project_task_counts(projects)
+    # Counter về 0 vẫn còn key, lần đếm lại thì không
+    return {project_id: {key: value for key, value in project_counts.items() if value or key == "Total"}
+            for project_id, project_counts in counts.items()}
+
+
+def random_writes(client, database, owner, project_ids, rng, steps):
+    for _ in range(steps):
+        task_ids = [task['_id'] for task in database.tasks.find({}, {"_id": 1})]
+        action = rng.choice(["create", "update", "create_many", "update_many"] if task_ids else ["create"])
+        if action == "create":
+            response = client.post("/create_task", json={
+                "AdminID": str(owner), "ProjectID": str(rng.choice(project_ids)), "AssignedTo": str(owner),
+                "TaskName": "task", "DueDate": "2030-01-01", "Status": rng.choice(STATUSES)
+            })
+            assert response.status_code == 201
+        elif action == "update":
+            response = client.put("/update_task", json={"TaskID": str(rng.choice(task_ids)),
+                                                        "Status": rng.choice(STATUSES)})
+            assert response.status_code == 200
+        elif action == "create_many":
+            response = client.post("/create_tasks", json={"AdminID": str(owner), "Tasks": [{
+                "ProjectID": str(rng.choice(project_ids)), "AssignedTo": str(owner), "TaskName": "task",
+                "DueDate": "2030-01-01", "Status": rng.choice(STATUSES)
+            } for _ in range(rng.randint(1, 4))]})
+            assert response.status_code == 201
+        else:
+            response = client.put("/update_tasks", json={"AdminID": str(owner), "Tasks": [
+                {"TaskID": str(task_id), "Status": rng.choice(STATUSES)}
+                for task_id in rng.sample(task_ids, min(len(task_ids), rng.randint(1, 4)))
+            ]})
+            assert response.status_code == 200
+
+
+def test_counters_match_recount_after_random_writes(client, database, owner):
+    rng = random.Random(7)
+    project_ids = [make_project(database, owner) for _ in range(3)]
+    legacy_id = make_project(database, owner)
+    database.project.update_one({"_id": legacy_id}, {"$unset": {"TaskCounts": ""}})
+    database.tasks.insert_many([{"ProjectID": legacy_id, "AssignedTo": owner, "Status": "Completed"}
+                                for _ in range(3)])
+    project_ids.append(legacy_id)
+
+    random_writes(client, database, owner, project_ids, rng, 200)
+
+    assert stored_counts(database, project_ids) == main.count_tasks(project_ids)
+    # Project cũ vẫn được đếm lại, không bị tạo TaskCounts thiếu
+    assert "TaskCounts" not in database.project.find_one({"_id": legacy_id})
+
+
+def test_legacy_project_report_after_create_task(client, database, owner):
+    legacy_id = make_project(database, owner)
+    database.project.update_one({"_id": legacy_id}, {"$unset": {"TaskCounts": ""}})
+    database.tasks.insert_many([{"ProjectID": legacy_id, "AssignedTo": owner, "Status": "Completed"}
+                                for _ in range(3)])
+
+    response = client.post("/create_task", json={"AdminID": str(owner), "ProjectID": str(legacy_id),
+                                                 "AssignedTo": str(owner), "TaskName": "task",
+                                                 "DueDate": "2030-01-01"})
+    assert response.status_code == 201
+
+    report = client.get(f"/project_report?ProjectID={legacy_id}").get_json()['report']
+    assert report['TotalTasks'] == 4
+    assert report['CompletedTasks'] == 3
+
+
+def test_reconcile_backfills_legacy_project(app, client, database, owner):
+    legacy_id = make_project(database, owner)
+    database.project.update_one({"_id": legacy_id}, {"$unset": {"TaskCounts": ""}})
+    database.tasks.insert_many([{"ProjectID": legacy_id, "AssignedTo": owner, "Status": status}
+                                for status in ["Pending", "Completed", "Completed"]])
+
+    result = app.test_cli_runner().invoke(args=["reconcile-task-counts"])
+    assert result.exit_code == 0
+
+    assert database.project.find_one({"_id": legacy_id})['TaskCounts'] == {"Total": 3, "Pending": 1, "Completed": 2}
+    random_writes(client, database, owner, [legacy_id], random.Random(3), 50)
+    assert stored_counts(database, [legacy_id]) == main.count_tasks([legacy_id])
+
+
+def test_create_task_when_project_archived_mid_request(monkeypatch, client, database, owner):
+    # Project bị lưu trữ/xóa hẳn sau khi create_task đã đọc nó: task vẫn được tạo, không trả 500
+    project_id = make_project(database, owner)
+    original_insert_one = mongomock.collection.Collection.insert_one
+
+    def insert_one(self, document, *args, **kwargs):
+        result = original_insert_one(self, document, *args, **kwargs)
+        if self.name == "tasks":
+            database.project.delete_one({"_id": project_id})
+        return result
+
+    monkeypatch.setattr(mongomock.collection.Collection, "insert_one", insert_one)
+
+    response = client.post("/create_task", json={"AdminID": str(owner), "ProjectID": str(project_id),
+                                                 "AssignedTo": str(owner), "TaskName": "task",
+                                                 "DueDate": "2030-01-01"})
+    assert response.status_code == 201
+    assert database.tasks.count_documents({"ProjectID": project_id}) == 1
@@ -0,0 +1,57 @@
+import pytest
+from bson import ObjectId
+
+from conftest import count_calls, make_project
+
+READ_METHODS = ["find", "find_one", "aggregate", "count_documents", "distinct"]
+
+
+@pytest.fixture
+def query_counter(monkeypatch):
+    return count_calls(monkeypatch, READ_METHODS)
+
+
+def project_with_members(database, owner, member_count, task_count):
+    members = [{"MemberID": owner, "Role": "Owner"}]
+    for i in range(member_count):
+        user_id = database.user.insert_one({"Username": f"u{ObjectId()}", "Name": f"Member {i}"}).inserted_id
+        members.append({"MemberID": user_id, "Role": "Member"})
+    project_id = make_project(database, owner, Members=members, StartDate=None, CreateDate=None)
+    database.tasks.insert_many([{"ProjectID": project_id, "AssignedTo": owner, "TaskName": f"t{i}",
+                                 "Status": "Pending"} for i in range(task_count)])
+    return project_id
+
+
+def test_query_count_does_not_grow_with_members(client, database, owner, query_counter):
+    counts = []
+    for member_count, task_count in ((2, 3), (60, 40)):
+        project_id = project_with_members(database, owner, member_count, task_count)
+        query_counter.clear()
+        response = client.get(f"/project?ProjectID={project_id}&UserID={owner}")
+        assert response.status_code == 200
+        body = response.get_json()
+        assert len(body['Members']) == member_count + 1
+        assert len(body['Tasks']) == task_count
+        counts.append(len(query_counter))
+
+    # project, tên thành viên (một $in) và tasks
+    assert counts == [3, 3]
+
+
+def test_access_denied_does_not_read_tasks(client, database, owner, query_counter):
+    project_id = project_with_members(database, owner, 2, 5)
+    query_counter.clear()
+    response = client.get(f"/project?ProjectID={project_id}&UserID={ObjectId()}")
+    assert response.status_code == 403
+    assert ("tasks", "find") not in query_counter
+
+
+def test_guessed_etag_does_not_bypass_access_check(client, database, owner):
+    project_id = project_with_members(database, owner, 2, 1)
+    etag = client.get(f"/project?ProjectID={project_id}&UserID={owner}").headers['ETag']
+
+    assert client.get(f"/project?ProjectID={project_id}&UserID={owner}",
+                      headers={"If-None-Match": etag}).status_code == 304
+    # ETag = sha1(ProjectID|Revision) nên người ngoài tự tính được; vẫn phải nhận 403
+    response = client.get(f"/project?ProjectID={project_id}&UserID={ObjectId()}", headers={"If-None-Match": etag})
+    assert response.status_code == 403